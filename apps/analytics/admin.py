@@ -1,5 +1,5 @@
 from django.contrib import admin
-from apps.analytics.models import Feedback
+from apps.analytics.models import AnalyticsExport, Feedback
 
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
@@ -7,3 +7,10 @@ class FeedbackAdmin(admin.ModelAdmin):
     list_filter = ('overall_satisfaction', 'would_recommend', 'created_at')
     search_fields = ('patient__first_name', 'patient__email')
     readonly_fields = ('created_at',)
+
+
+@admin.register(AnalyticsExport)
+class AnalyticsExportAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'start_date', 'end_date', 'file_format', 'status', 'requested_by', 'result_rows', 'created_at')
+    list_filter = ('status', 'kind', 'file_format')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'source_rows', 'result_rows', 'error')
@@ -0,0 +1,156 @@
+"""
+Server-side analytics charts: drawn in a process pool and cached on disk per data version and window
+
+Chart data comes from the rollup queries in the web process; the drawing
+(apps.analytics.plotting) runs in a small pool of worker processes so
+matplotlib never blocks the request threads or grows their memory. Images are
+written to ANALYTICS_CHART_DIR under a name that includes the window, the
+date and the analytics data version, so a file never changes once written and
+browsers may cache it for good.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.analytics import plotting, queries
+from apps.analytics.result_cache import data_version
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def _daily(rows, start_date, field):
+    """(ISO date, value) for every day from start_date to today or the last row; the rollups skip empty days"""
+    values = {row['date']: row[field] for row in rows}
+    days = (max([timezone.localdate(), *values]) - start_date).days + 1
+    return [
+        ((start_date + timedelta(days=offset)).isoformat(), float(values.get(start_date + timedelta(days=offset), 0)))
+        for offset in range(days)
+    ]
+
+
+def _appointment_trend(start_date):
+    return {'points': _daily(queries.daily_appointments(start_date), start_date, 'count'), 'ylabel': 'Appointments'}
+
+
+def _scan_types(start_date):
+    return {
+        'items': [(row['scan_type__name'] or 'Unassigned', row['count'])
+                  for row in queries.appointment_summary(start_date)['scan_breakdown']],
+        'xlabel': 'Appointments',
+    }
+
+
+def _revenue_trend(start_date):
+    return {'points': _daily(queries.daily_revenue(start_date), start_date, 'total'), 'ylabel': 'Revenue (R)'}
+
+
+def _payment_methods(start_date):
+    return {
+        'items': [(row['payment_method'], float(row['total'])) for row in queries.payment_method_breakdown(start_date)],
+        'xlabel': 'Revenue (R)',
+    }
+
+
+# name: (plotting function, data function, title)
+CHARTS = {
+    'appointment-trend': (plotting.trend, _appointment_trend, 'Appointments per day'),
+    'scan-types': (plotting.breakdown, _scan_types, 'Appointments by scan type'),
+    'revenue-trend': (plotting.trend, _revenue_trend, 'Completed revenue per day'),
+    'payment-methods': (plotting.breakdown, _payment_methods, 'Completed revenue by payment method'),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    """The process's chart pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers start clean instead of inheriting the web process's threads and connections
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.ANALYTICS_CHART_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def current_tag():
+    """Today's date and the data version; part of every chart URL and file name"""
+    return f'{timezone.localdate():%Y%m%d}.{data_version()}'
+
+
+def chart_path(name, days, file_format, tag):
+    return Path(settings.ANALYTICS_CHART_DIR) / f'{name}_{days}_{tag}.{file_format}'
+
+
+def _draw(name, days, file_format):
+    draw, data, title = CHARTS[name]
+    pool = _executor()
+    future = pool.submit(draw, title=title, file_format=file_format, **data(queries.window_start(days)))
+    try:
+        return future.result(timeout=settings.ANALYTICS_CHART_TIMEOUT_SECONDS)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        _discard_pool(pool)
+        raise
+
+
+def _write(path, image):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a temporary name and renamed, so readers never see half a file
+    temporary = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    temporary.write_bytes(image)
+    os.replace(temporary, path)
+    # Earlier versions and windows of this chart can never be requested again
+    name, days, _ = path.stem.split('_')
+    for stale in path.parent.glob(f'{name}_{days}_*{path.suffix}'):
+        if stale != path:
+            try:
+                stale.unlink()
+            except OSError:
+                pass  # Still open on Windows; removed after the next render
+
+
+def render(name, days, file_format, tag):
+    """
+    Path to the chart image for this window and tag, drawing it if needed.
+
+    Single-flight like cached_result: one request per chart draws while the
+    others wait briefly for its file. Raises TimeoutError or
+    BrokenProcessPool when the pool cannot draw in time.
+    """
+    path = chart_path(name, days, file_format, tag)
+    if path.exists():
+        return path
+    lock_key = f'analytics:chart:{path.name}:lock'
+    locked = cache.add(lock_key, 1, settings.ANALYTICS_RECOMPUTE_LOCK_SECONDS)
+    if not locked:
+        deadline = time.monotonic() + settings.ANALYTICS_RECOMPUTE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            if path.exists():
+                return path
+    try:
+        _write(path, _draw(name, days, file_format))
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return path
@@ -0,0 +1,220 @@
+"""
+Background analytics exports: raw rows are streamed in chunks, aggregated with pandas and saved as a file
+
+pandas is imported inside the functions that need it, so web processes that
+only queue exports never load it.
+"""
+import io
+import logging
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsExport, Feedback
+from apps.analytics.queries import start_of
+from apps.payments.models import Payment
+
+logger = logging.getLogger(__name__)
+
+REVENUE_COLUMNS = ['created_at', 'scan_type', 'payment_method', 'status', 'amount', 'shortfall']
+REVENUE_KEYS = ['date', 'scan_type', 'payment_method', 'status']
+
+FEEDBACK_COLUMNS = ['created_at', 'overall', 'staff', 'cleanliness', 'report', 'would_recommend']
+RATINGS = range(1, 6)
+
+
+def parquet_available():
+    """Parquet needs pyarrow or fastparquet next to pandas"""
+    for engine in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(engine)
+        except ImportError:
+            continue
+        return True
+    return False
+
+
+def _window(queryset, start_date, end_date):
+    return queryset.filter(created_at__gte=start_of(start_date), created_at__lt=start_of(end_date + timedelta(days=1)))
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _local_dates(series):
+    import pandas as pd
+    return pd.to_datetime(series, utc=True).dt.tz_convert(settings.TIME_ZONE).dt.date
+
+
+def _revenue_rows(start_date, end_date):
+    return _window(Payment.objects.all(), start_date, end_date).values_list(
+        'created_at', 'appointment__scan_type__name', 'payment_method', 'status',
+        'service_charge', 'shortfall__shortfall_amount',
+    )
+
+
+def _revenue_partial(frame):
+    import pandas as pd
+    frame['date'] = _local_dates(frame['created_at'])
+    frame['scan_type'] = frame['scan_type'].fillna('Unassigned')
+    frame['amount'] = pd.to_numeric(frame['amount'])
+    frame['shortfall'] = pd.to_numeric(frame['shortfall'])
+    return frame.groupby(REVENUE_KEYS).agg(
+        count=('amount', 'size'),
+        total=('amount', 'sum'),
+        shortfall_count=('shortfall', 'count'),
+        shortfall_total=('shortfall', 'sum'),
+    )
+
+
+def _revenue_result(partials):
+    import pandas as pd
+    if not partials:
+        return pd.DataFrame(columns=REVENUE_KEYS + ['count', 'total', 'avg_amount', 'shortfall_count', 'shortfall_total'])
+    result = pd.concat(partials).groupby(level=REVENUE_KEYS).sum()
+    result['avg_amount'] = result['total'] / result['count']
+    result = result[['count', 'total', 'avg_amount', 'shortfall_count', 'shortfall_total']]
+    return result.round({'total': 2, 'avg_amount': 2, 'shortfall_total': 2}).reset_index()
+
+
+def _feedback_rows(start_date, end_date):
+    return _window(Feedback.objects.all(), start_date, end_date).values_list(
+        'created_at', 'overall_satisfaction', 'staff_professionalism', 'facility_cleanliness',
+        'report_clarity', 'would_recommend',
+    )
+
+
+def _feedback_partial(frame):
+    frame['date'] = _local_dates(frame['created_at'])
+    for rating in RATINGS:
+        frame[f'rating_{rating}'] = (frame['overall'] == rating).astype(int)
+    frame['would_recommend'] = frame['would_recommend'].astype(int)
+    grouped = frame.groupby('date')
+    partial = grouped[['overall', 'staff', 'cleanliness', 'would_recommend'] + [f'rating_{rating}' for rating in RATINGS]].sum()
+    partial['count'] = grouped.size()
+    partial['report'] = grouped['report'].sum(min_count=1).fillna(0)
+    partial['report_count'] = grouped['report'].count()
+    return partial
+
+
+def _feedback_result(partials):
+    import pandas as pd
+    columns = ['date', 'count', 'avg_overall', 'avg_staff', 'avg_cleanliness', 'avg_report', 'recommend_rate'] + \
+        [f'rating_{rating}' for rating in RATINGS]
+    if not partials:
+        return pd.DataFrame(columns=columns)
+    sums = pd.concat(partials).groupby(level='date').sum()
+    result = pd.DataFrame(index=sums.index)
+    result['count'] = sums['count']
+    result['avg_overall'] = sums['overall'] / sums['count']
+    result['avg_staff'] = sums['staff'] / sums['count']
+    result['avg_cleanliness'] = sums['cleanliness'] / sums['count']
+    result['avg_report'] = sums['report'] / sums['report_count'].where(sums['report_count'] > 0)
+    result['recommend_rate'] = sums['would_recommend'] / sums['count'] * 100
+    for rating in RATINGS:
+        result[f'rating_{rating}'] = sums[f'rating_{rating}']
+    return result.round(2).reset_index()[columns]
+
+
+KINDS = {
+    'revenue': (_revenue_rows, REVENUE_COLUMNS, _revenue_partial, _revenue_result),
+    'feedback': (_feedback_rows, FEEDBACK_COLUMNS, _feedback_partial, _feedback_result),
+}
+
+
+def build(kind, start_date, end_date, chunk_size=None):
+    """
+    Aggregate a kind's raw rows for start_date..end_date.
+
+    Rows are read with a server-side cursor and aggregated chunk by chunk,
+    so memory stays bounded by chunk_size plus the (per-day) partial sums.
+    Returns (DataFrame, source row count).
+    """
+    import pandas as pd
+    rows, columns, partial, result = KINDS[kind]
+    chunk_size = chunk_size or settings.ANALYTICS_EXPORT_CHUNK_SIZE
+    partials, source_rows = [], 0
+    for chunk in _chunks(rows(start_date, end_date).iterator(chunk_size=chunk_size), chunk_size):
+        source_rows += len(chunk)
+        partials.append(partial(pd.DataFrame.from_records(chunk, columns=columns)))
+    return result(partials), source_rows
+
+
+def serialize(frame, file_format):
+    buffer = io.BytesIO()
+    if file_format == 'parquet':
+        frame.to_parquet(buffer, index=False)
+    else:
+        buffer.write(frame.to_csv(index=False).encode('utf-8'))
+    return buffer.getvalue()
+
+
+def run(export_id):
+    """
+    Compute and store one export. Returns its final status, or None when
+    another worker already took it (a redelivered message is a no-op).
+    """
+    taken = AnalyticsExport.objects.filter(id=export_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not taken:
+        return None
+    export = AnalyticsExport.objects.get(id=export_id)
+    try:
+        frame, source_rows = build(export.kind, export.start_date, export.end_date)
+        name = f'{export.kind}-{export.start_date}-{export.end_date}-{export.id.hex[:8]}.{export.file_format}'
+        export.file.save(name, ContentFile(serialize(frame, export.file_format)), save=False)
+    except Exception as exc:
+        logger.exception('Analytics export %s failed', export_id)
+        AnalyticsExport.objects.filter(id=export_id).update(
+            status='failed', error=f'{exc.__class__.__name__}: {exc}', finished_at=timezone.now()
+        )
+        return 'failed'
+    AnalyticsExport.objects.filter(id=export_id).update(
+        status='succeeded', file=export.file.name, source_rows=source_rows, result_rows=len(frame),
+        finished_at=timezone.now(),
+    )
+    return 'succeeded'
+
+
+def queue(export):
+    """Hand an export to the bulk workers once the current transaction commits"""
+    def publish():
+        from apps.analytics.tasks import run_export
+        try:
+            run_export.delay(str(export.id))
+        except Exception:
+            # Left pending; the export sweep publishes it again
+            logger.warning('Could not queue analytics export %s', export.id, exc_info=True)
+    transaction.on_commit(publish)
+
+
+def sweep(now=None):
+    """
+    Requeue exports whose message was lost, fail ones whose worker died,
+    and delete expired exports with their files. Returns counts.
+    """
+    now = now or timezone.now()
+    requeued = 0
+    for export in AnalyticsExport.objects.filter(status='pending', created_at__lt=now - timedelta(minutes=2)):
+        queue(export)
+        requeued += 1
+    interrupted = AnalyticsExport.objects.filter(
+        status='running', started_at__lt=now - timedelta(seconds=settings.ANALYTICS_EXPORT_TIMEOUT_SECONDS)
+    ).update(status='failed', error='Interrupted: the worker stopped before finishing', finished_at=now)
+    expired = 0
+    for export in AnalyticsExport.objects.filter(
+        created_at__lt=now - timedelta(days=settings.ANALYTICS_EXPORT_RETENTION_DAYS)
+    ).exclude(status='running'):
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        expired += 1
+    return {'requeued': requeued, 'interrupted': interrupted, 'expired': expired}
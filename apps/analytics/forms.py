@@ -0,0 +1,27 @@
+from django import forms
+from django.conf import settings
+from apps.analytics.exports import parquet_available
+from apps.analytics.models import AnalyticsExport
+
+class AnalyticsExportForm(forms.ModelForm):
+    """Date range and file format for a background analytics export"""
+
+    class Meta:
+        model = AnalyticsExport
+        fields = ('start_date', 'end_date', 'file_format')
+
+    def clean_file_format(self):
+        file_format = self.cleaned_data['file_format']
+        if file_format == 'parquet' and not parquet_available():
+            raise forms.ValidationError('Parquet export is not available on this server; choose CSV.')
+        return file_format
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start and end:
+            if end < start:
+                raise forms.ValidationError('The end date must not be before the start date.')
+            if (end - start).days > settings.ANALYTICS_EXPORT_MAX_DAYS:
+                raise forms.ValidationError(f'Exports cover at most {settings.ANALYTICS_EXPORT_MAX_DAYS} days.')
+        return cleaned_data
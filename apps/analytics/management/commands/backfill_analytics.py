@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.rollups import ROLLUPS
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily analytics rollups from the raw tables, a chunk of days at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rollup', choices=sorted(ROLLUPS), action='append',
+                            help='Rollup to rebuild (repeatable; default: all)')
+        parser.add_argument('--start', help='First day, YYYY-MM-DD (default: earliest record)')
+        parser.add_argument('--end', help='Last day, YYYY-MM-DD (default: latest record)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+
+        for name in options['rollup'] or sorted(ROLLUPS):
+            written = ROLLUPS[name].rebuild(start, end, chunk_days=options['chunk_days'])
+            self.stdout.write(f"{name}: {written} rollup row(s) written")
+        self.stdout.write(self.style.SUCCESS('Backfill complete'))
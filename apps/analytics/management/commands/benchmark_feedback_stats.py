@@ -0,0 +1,68 @@
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.analytics.stats import DIMENSIONS, rating_counts, summarize_counts, to_arrays
+
+class Command(BaseCommand):
+    help = 'Time the NumPy feedback statistics on synthetic rows (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic feedback rows')
+        parser.add_argument('--scan-types', type=int, default=8, help='Distinct scan types')
+        parser.add_argument('--bootstrap', type=int, default=1000, help='Bootstrap resamples')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Also time a pure-Python loop computing the distributions and means')
+
+    def _best(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        rows = options['rows']
+        ratings = rng.choice(np.arange(1, 6), size=(rows, len(DIMENSIONS)), p=[0.05, 0.1, 0.2, 0.3, 0.35])
+        ratings[rng.random(rows) < 0.3, DIMENSIONS.index('report_clarity')] = 0
+        groups = rng.integers(0, options['scan_types'], size=rows)
+        # What stats.load gets from values_list: int tuples (0 = missing) ending in a scan type UUID
+        scan_ids = [uuid.uuid4() for _ in range(options['scan_types'])]
+        records = [(*map(int, row), scan_ids[group]) for row, group in zip(ratings.tolist(), groups.tolist())]
+        self.stdout.write(f"{rows:,} rows, {len(DIMENSIONS)} dimensions, {options['scan_types']} scan types, "
+                          f"{options['bootstrap']} bootstrap resamples")
+
+        convert, _ = self._best(options['repeat'], lambda: to_arrays(records))
+        self.stdout.write(f"  rows -> arrays     {convert * 1000:8.1f} ms")
+
+        counts_time, counts = self._best(options['repeat'], lambda: (
+            rating_counts(ratings), rating_counts(ratings, groups, options['scan_types'])))
+        self.stdout.write(f"  rating counts      {counts_time * 1000:8.1f} ms")
+
+        stats_time, _ = self._best(options['repeat'], lambda: (
+            summarize_counts(counts[0], bootstrap=options['bootstrap'], seed=1),
+            summarize_counts(counts[1], bootstrap=options['bootstrap'], seed=1)))
+        self.stdout.write(f"  statistics + CIs   {stats_time * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  total (excl. query) {(convert + counts_time + stats_time) * 1000:7.1f} ms"))
+
+        if options['baseline']:
+            def python_loop():
+                distribution = [[0] * 5 for _ in DIMENSIONS]
+                totals = [0] * len(DIMENSIONS)
+                seen = [0] * len(DIMENSIONS)
+                for record in records:
+                    for position, value in enumerate(record[:len(DIMENSIONS)]):
+                        if value:
+                            distribution[position][value - 1] += 1
+                            totals[position] += value
+                            seen[position] += 1
+                return [total / count for total, count in zip(totals, seen)]
+            loop, _ = self._best(1, python_loop)
+            self.stdout.write(f"  pure-Python loop   {loop * 1000:8.1f} ms (distributions and means only; "
+                              f"no per-scan figures, percentiles or CIs)")
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_feedback_created_index'),
+        ('appointments', '0012_appointment_analytics_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFeedbackStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('overall_sum', models.PositiveIntegerField(default=0)),
+                ('staff_sum', models.PositiveIntegerField(default=0)),
+                ('cleanliness_sum', models.PositiveIntegerField(default=0)),
+                ('report_sum', models.PositiveIntegerField(default=0)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('recommend_count', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyAppointmentStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('scan_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.scantype')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenueStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shortfall_count', models.PositiveIntegerField(default=0)),
+                ('shortfall_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('scan_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.scantype')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyappointmentstat',
+            constraint=models.UniqueConstraint(fields=('date', 'scan_type', 'status'), name='daily_appt_stat_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenuestat',
+            constraint=models.UniqueConstraint(fields=('date', 'scan_type', 'payment_method', 'status'), name='daily_revenue_stat_key'),
+        ),
+    ]
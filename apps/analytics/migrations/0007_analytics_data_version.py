@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_analytics_export'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDataVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+    ]
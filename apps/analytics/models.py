@@ -1,6 +1,6 @@
 from django.db import models
 from apps.users.models import CustomUser
-from apps.appointments.models import Appointment
+from apps.appointments.models import Appointment, ScanType
 import uuid
 
 class Feedback(models.Model):
@@ -33,6 +33,9 @@ class Feedback(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='feedback_created_idx'),
+        ]
     
     def __str__(self):
         return f"Feedback from {self.patient.get_full_name()}"
@@ -47,3 +50,135 @@ class Feedback(models.Model):
         if self.report_clarity:
             ratings.append(self.report_clarity)
         return sum(ratings) / len(ratings) if ratings else 0
+
+
+class DailyAppointmentStat(models.Model):
+    """
+    Appointments per day, scan type and status (rollup maintained by apps.analytics.rollups)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    scan_type = models.ForeignKey(ScanType, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'scan_type', 'status'], name='daily_appt_stat_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.scan_type_id} {self.status}: {self.count}"
+
+
+class DailyRevenueStat(models.Model):
+    """
+    Payments per day of creation, scan type, payment method and status
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    scan_type = models.ForeignKey(ScanType, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    payment_method = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shortfall_count = models.PositiveIntegerField(default=0)
+    shortfall_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'scan_type', 'payment_method', 'status'],
+                                    name='daily_revenue_stat_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.payment_method} {self.status}: {self.total}"
+
+
+class DailyFeedbackStat(models.Model):
+    """
+    Feedback sums and counts per day, so averages can be rebuilt for any window
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField(unique=True)
+    count = models.PositiveIntegerField(default=0)
+    overall_sum = models.PositiveIntegerField(default=0)
+    staff_sum = models.PositiveIntegerField(default=0)
+    cleanliness_sum = models.PositiveIntegerField(default=0)
+    report_sum = models.PositiveIntegerField(default=0)
+    report_count = models.PositiveIntegerField(default=0)
+    recommend_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date}: {self.count} feedback"
+
+
+class AnalyticsDataVersion(models.Model):
+    """
+    Counter bumped on every rollup refresh; cached analytics results and
+    chart images are keyed by it. Kept in the database so every web and
+    worker process sees the same value.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class AnalyticsExport(models.Model):
+    """
+    Long-range analysis computed by a background job and stored as a downloadable file
+    """
+    KIND_CHOICES = [
+        ('revenue', 'Revenue'),
+        ('feedback', 'Feedback'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='analytics_exports')
+    
+    file = models.FileField(upload_to='analytics_exports/', blank=True)
+    source_rows = models.PositiveIntegerField(default=0)
+    result_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} export {self.start_date} to {self.end_date} ({self.status})"  # type: ignore
@@ -0,0 +1,70 @@
+"""
+Chart drawing for the analytics chart service (apps.analytics.charts)
+
+These functions run inside the chart worker processes, so this module imports
+nothing from Django: each takes plain lists and returns the encoded image.
+"""
+import io
+from datetime import date
+
+# The dashboard's grey palette
+COLOURS = ['#333333', '#666666', '#999999', '#cccccc', '#dddddd']
+
+
+def _figure(title):
+    # Figure without pyplot: no global state and no GUI backend in the workers
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(6.4, 3.2), dpi=100, layout='constrained')
+    axes = figure.add_subplot()
+    axes.set_title(title, loc='left', fontsize=11)
+    for side in ('top', 'right'):
+        axes.spines[side].set_visible(False)
+    return figure, axes
+
+
+def _no_data(axes):
+    axes.text(0.5, 0.5, 'No data for this period', ha='center', va='center', color='#666666', transform=axes.transAxes)
+    axes.set_xticks([])
+    axes.set_yticks([])
+
+
+def _encode(figure, file_format):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=file_format, metadata={'Date': None} if file_format == 'svg' else None)
+    return buffer.getvalue()
+
+
+def trend(title, points, ylabel, file_format='png'):
+    """Line chart of (ISO date, value) points"""
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    figure, axes = _figure(title)
+    if points:
+        days = [date.fromisoformat(day) for day, _ in points]
+        values = [value for _, value in points]
+        axes.plot(days, values, color=COLOURS[0], linewidth=1.5)
+        axes.fill_between(days, values, color=COLOURS[3], alpha=0.5)
+        locator = AutoDateLocator()
+        axes.xaxis.set_major_locator(locator)
+        axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        axes.set_ylabel(ylabel)
+        axes.set_ylim(bottom=0)
+        axes.grid(axis='y', color='#e0e0e0')
+    else:
+        _no_data(axes)
+    return _encode(figure, file_format)
+
+
+def breakdown(title, items, xlabel, file_format='png'):
+    """Horizontal bars of (label, value) items, largest first"""
+    figure, axes = _figure(title)
+    if items:
+        items = sorted(items, key=lambda item: item[1])
+        labels = [label for label, _ in items]
+        values = [value for _, value in items]
+        bars = axes.barh(labels, values, height=0.6, color=COLOURS[0])
+        axes.bar_label(bars, fmt='{:,.0f}', padding=3, fontsize=9)
+        axes.set_xlabel(xlabel)
+        axes.margins(x=0.15)
+    else:
+        _no_data(axes)
+    return _encode(figure, file_format)
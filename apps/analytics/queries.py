@@ -0,0 +1,152 @@
+"""
+Analytics data layer: windows are summed from the daily rollup tables (apps.analytics.rollups)
+
+A 365-day window reads at most a few hundred rollup rows per figure set,
+whatever the size of the raw Appointment, Payment and Feedback tables.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from apps.analytics.models import DailyAppointmentStat, DailyFeedbackStat, DailyRevenueStat
+from apps.appointments.models import ScanType
+
+RATINGS = range(1, 6)
+
+
+def window_start(days):
+    """First day of a window of the given length ending today"""
+    return timezone.now().date() - timedelta(days=days)
+
+
+def start_of(day):
+    """Aware midnight of a date, for filtering DateTimeFields"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+
+def _average(total, count):
+    return total / count if count else None
+
+
+def appointment_summary(start_date):
+    """Totals by status and per scan type"""
+    rows = (
+        DailyAppointmentStat.objects.filter(date__gte=start_date)
+        .values('scan_type_id', 'status')
+        .annotate(count=Sum('count'))
+        .order_by()
+    )
+    summary = {'total': 0, 'completed': 0, 'missed': 0, 'cancelled': 0}
+    per_scan = {}
+    for row in rows:
+        summary['total'] += row['count']
+        per_scan[row['scan_type_id']] = per_scan.get(row['scan_type_id'], 0) + row['count']
+        if row['status'] == 'completed':
+            summary['completed'] += row['count']
+        elif row['status'] == 'no_show':
+            summary['missed'] += row['count']
+        elif row['status'] == 'cancelled':
+            summary['cancelled'] += row['count']
+    names = dict(ScanType.objects.filter(id__in=[scan for scan in per_scan if scan]).values_list('id', 'name'))
+    summary['scan_breakdown'] = sorted(
+        ({'scan_type__name': names.get(scan_type_id), 'count': count} for scan_type_id, count in per_scan.items()),
+        key=lambda row: -row['count'],
+    )
+    summary['completion_rate'] = _percent(summary['completed'], summary['total'])
+    summary['missed_rate'] = _percent(summary['missed'], summary['total'])
+    return summary
+
+
+def daily_appointments(start_date):
+    """Appointments per day"""
+    return list(
+        DailyAppointmentStat.objects.filter(date__gte=start_date)
+        .values('date')
+        .annotate(count=Sum('count'))
+        .order_by('date')
+    )
+
+
+def revenue_summary(start_date):
+    """Completed and pending revenue plus shortfalls"""
+    summary = DailyRevenueStat.objects.filter(date__gte=start_date).aggregate(
+        total_revenue=Sum('total', filter=Q(status='completed')),
+        pending_revenue=Sum('total', filter=Q(status='pending')),
+        total_shortfall=Sum('shortfall_total'),
+        shortfall_count=Sum('shortfall_count'),
+    )
+    summary['shortfall_count'] = summary['shortfall_count'] or 0
+    return summary
+
+
+def feedback_summary(start_date):
+    """Averages, recommendation counts and the rating distribution"""
+    sums = DailyFeedbackStat.objects.filter(date__gte=start_date).aggregate(
+        total=Sum('count'),
+        overall=Sum('overall_sum'),
+        staff=Sum('staff_sum'),
+        cleanliness=Sum('cleanliness_sum'),
+        report=Sum('report_sum'),
+        report_count=Sum('report_count'),
+        recommend=Sum('recommend_count'),
+        **{f'rating_{rating}': Sum(f'rating_{rating}') for rating in RATINGS},
+    )
+    total = sums['total'] or 0
+    would_recommend = sums['recommend'] or 0
+    return {
+        'total': total,
+        'avg_overall': _average(sums['overall'], total),
+        'avg_staff': _average(sums['staff'], total),
+        'avg_cleanliness': _average(sums['cleanliness'], total),
+        'avg_report': _average(sums['report'], sums['report_count']),
+        'would_recommend': would_recommend,
+        'would_not_recommend': total - would_recommend,
+        'rating_distribution': {rating: sums[f'rating_{rating}'] or 0 for rating in RATINGS},
+        'recommend_rate': _percent(would_recommend, total),
+    }
+
+
+def _completed_revenue(start_date):
+    return DailyRevenueStat.objects.filter(date__gte=start_date, status='completed')
+
+
+def revenue_by_scan(start_date):
+    rows = (
+        _completed_revenue(start_date)
+        .values('scan_type__name')
+        .annotate(total_revenue=Sum('total'), count=Sum('count'))
+        .order_by('-total_revenue')
+    )
+    return [
+        {
+            'appointment__scan_type__name': row['scan_type__name'],
+            'total_revenue': row['total_revenue'],
+            'count': row['count'],
+            'avg_amount': _average(row['total_revenue'], row['count']),
+        }
+        for row in rows
+    ]
+
+
+def daily_revenue(start_date):
+    """Completed revenue per day of payment creation, in the current time zone"""
+    return list(
+        _completed_revenue(start_date)
+        .values('date')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('date')
+    )
+
+
+def payment_method_breakdown(start_date):
+    return list(
+        _completed_revenue(start_date)
+        .values('payment_method')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('-total')
+    )
@@ -0,0 +1,87 @@
+"""
+Analytics result cache: contexts keyed by view, window and a data version bumped on every rollup refresh
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsDataVersion
+
+# Windows the views offer; any other ?days= is snapped up to the next one
+WINDOWS = (7, 30, 90, 180, 365, 730)
+
+VERSION_NAME = 'results'
+
+
+def snap_days(value, default):
+    """The supported window for a ?days= value; bad input gives the default"""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return default
+    for window in WINDOWS:
+        if days <= window:
+            return window
+    return WINDOWS[-1]
+
+
+def data_version():
+    """The current data version, read from the database so all processes agree"""
+    versions = AnalyticsDataVersion.objects.filter(name=VERSION_NAME)
+    version = versions.values_list('version', flat=True).first()
+    if version is None:
+        # Start from a fresh number so entries left in a shared cache by an older database never match
+        version = versions.get_or_create(name=VERSION_NAME, defaults={'version': time.time_ns()})[0].version
+    return version
+
+
+def bump_version():
+    """Mark every cached result stale; called after each rollup refresh commits"""
+    if not AnalyticsDataVersion.objects.filter(name=VERSION_NAME).update(version=F('version') + 1):
+        data_version()
+
+
+def _key(view, days):
+    # The date is part of the key because the window ends today
+    return f'analytics:result:{view}:{days}:{timezone.localdate().isoformat()}'
+
+
+def cached_result(view, days, compute):
+    """
+    Return compute()'s result for this view and window, recomputing at most
+    once per data version.
+
+    Single-flight: when the entry is stale, the request that wins a short
+    cache lock recomputes, and concurrent requests keep serving the stale
+    value meanwhile. With no value at all they wait briefly for the winner
+    before computing themselves.
+    """
+    key = _key(view, days)
+    version = data_version()
+    entry = cache.get(key)
+    if entry and entry['version'] == version:
+        return entry['data']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.ANALYTICS_RECOMPUTE_LOCK_SECONDS):
+        try:
+            data = compute()
+            # Stored under the version read before computing, so a write that
+            # lands mid-computation leaves this entry stale
+            cache.set(key, {'version': version, 'data': data}, settings.ANALYTICS_CACHE_SECONDS)
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    if entry:
+        return entry['data']
+    deadline = time.monotonic() + settings.ANALYTICS_RECOMPUTE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry:
+            return entry['data']
+    return compute()
@@ -0,0 +1,203 @@
+"""
+Daily analytics rollups: raw rows are aggregated per day into small tables the views read
+
+Each rollup is rebuilt a whole day (or run of days) at a time from its source
+table, so a refresh is idempotent and never drifts: save hooks queue a
+refresh of the days an edit touched on the bulk workers, the nightly
+reconcile refreshes recent days in case an edit bypassed the hooks, and
+backfill rebuilds any range of history.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.analytics.models import DailyAppointmentStat, DailyFeedbackStat, DailyRevenueStat, Feedback
+from apps.analytics.queries import start_of
+from apps.analytics.result_cache import bump_version
+from apps.appointments.models import Appointment
+from apps.jobs.models import JobLock
+from apps.payments.models import Payment
+
+
+class Rollup:
+    """How one rollup table is computed from its source"""
+
+    def __init__(self, name, model, source, date_field, day, keys, aggregates):
+        self.name = name
+        self.model = model
+        self.source = source
+        self.date_field = date_field
+        self.day = day
+        self.keys = keys
+        self.aggregates = aggregates
+
+    def _filter(self, start, end):
+        if self.date_field == 'appointment_date':
+            return {'appointment_date__range': (start, end)}
+        # Datetime sources are bucketed by local date; local midnights bound the same rows on the index
+        return {f'{self.date_field}__gte': start_of(start), f'{self.date_field}__lt': start_of(end + timedelta(days=1))}
+
+    def compute(self, start, end):
+        """Rollup rows for start..end (inclusive) from one grouped query on the source"""
+        rows = (
+            self.source().annotate(day=self.day).filter(**self._filter(start, end))
+            .values('day', *self.keys.values())
+            .annotate(**self.aggregates)
+            .order_by()
+        )
+        return [
+            self.model(
+                date=row['day'],
+                **{field: row[source] for field, source in self.keys.items()},
+                **{field: row[field] for field in self.aggregates},
+            )
+            for row in rows
+        ]
+
+    def refresh(self, start, end=None):
+        """
+        Replace the rollup rows for start..end. Returns the number of rows written.
+
+        Compute, delete and insert run in one transaction holding a row lock
+        on the rollup's JobLock, so concurrent refreshes of the same rollup
+        queue for a few milliseconds instead of interleaving.
+        """
+        end = end or start
+        lock_name = f'analytics-rollup:{self.name}'
+        JobLock.objects.get_or_create(name=lock_name, defaults={'locked_until': timezone.now()})
+        with transaction.atomic():
+            list(JobLock.objects.select_for_update().filter(name=lock_name).values_list('name', flat=True))
+            rows = self.compute(start, end)
+            self.model.objects.filter(date__range=(start, end)).delete()
+            self.model.objects.bulk_create(rows, batch_size=500)
+        transaction.on_commit(bump_version)
+        return len(rows)
+
+    def refresh_days(self, days):
+        """Refresh a set of single days, e.g. those touched by an edit"""
+        for day in sorted(set(days) - {None}):
+            self.refresh(day)
+
+    def bounds(self):
+        """First and last day present in the source, or (None, None)"""
+        span = self.source().aggregate(first=Min(self.date_field), last=Max(self.date_field))
+        first, last = span['first'], span['last']
+        if hasattr(first, 'date'):
+            first, last = timezone.localdate(first), timezone.localdate(last)
+        return first, last
+
+    def rebuild(self, start=None, end=None, chunk_days=31):
+        """
+        Rebuild start..end (default: the source's whole span) in chunks of
+        chunk_days, each its own short transaction. Returns the rows written.
+        """
+        first, last = self.bounds()
+        start, end = start or first, end or last
+        if start is None or end is None:
+            return 0
+        written = 0
+        while start <= end:
+            chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+            written += self.refresh(start, chunk_end)
+            start = chunk_end + timedelta(days=1)
+        return written
+
+
+APPOINTMENTS = Rollup(
+    name='appointments',
+    model=DailyAppointmentStat,
+    source=lambda: Appointment.objects.all(),
+    date_field='appointment_date',
+    day=F('appointment_date'),
+    keys={'scan_type_id': 'scan_type_id', 'status': 'status'},
+    aggregates={'count': Count('*')},
+)
+
+REVENUE = Rollup(
+    name='revenue',
+    model=DailyRevenueStat,
+    source=lambda: Payment.objects.all(),
+    date_field='created_at',
+    day=TruncDate('created_at'),
+    keys={'scan_type_id': 'appointment__scan_type_id', 'payment_method': 'payment_method', 'status': 'status'},
+    aggregates={
+        'count': Count('*'),
+        'total': Sum('service_charge'),
+        'shortfall_count': Count('shortfall'),
+        'shortfall_total': Sum('shortfall__shortfall_amount', default=0),
+    },
+)
+
+FEEDBACK = Rollup(
+    name='feedback',
+    model=DailyFeedbackStat,
+    source=lambda: Feedback.objects.all(),
+    date_field='created_at',
+    day=TruncDate('created_at'),
+    keys={},
+    aggregates={
+        'count': Count('*'),
+        'overall_sum': Sum('overall_satisfaction'),
+        'staff_sum': Sum('staff_professionalism'),
+        'cleanliness_sum': Sum('facility_cleanliness'),
+        'report_sum': Sum('report_clarity', default=0),
+        'report_count': Count('report_clarity'),
+        'recommend_count': Count('id', filter=Q(would_recommend=True)),
+        **{f'rating_{rating}': Count('id', filter=Q(overall_satisfaction=rating)) for rating in range(1, 6)},
+    },
+)
+
+ROLLUPS = {rollup.name: rollup for rollup in (APPOINTMENTS, REVENUE, FEEDBACK)}
+
+
+# How long a day stays marked as queued; bounds the delay if its task is lost
+PENDING_SECONDS = 600
+
+
+def _pending_key(rollup, day):
+    return f'analytics:rollup-pending:{rollup.name}:{day.isoformat()}'
+
+
+def clear_pending(rollup, days):
+    """Unmark days as queued; called as their refresh starts, so later edits queue again"""
+    cache.delete_many([_pending_key(rollup, day) for day in days])
+
+
+def _queue_refresh(rollup, days):
+    from apps.analytics.tasks import refresh_rollup
+    from apps.notifications.dispatch import dispatch
+
+    # A day already waiting in the queue will pick this change up too
+    days = [day for day in sorted(days) if cache.add(_pending_key(rollup, day), 1, PENDING_SECONDS)]
+    if days and dispatch(refresh_rollup, rollup.name, [day.isoformat() for day in days]) == 'dropped':
+        clear_pending(rollup, days)
+
+
+def refresh_later(rollup, days):
+    """
+    Queue a refresh of days on the bulk workers once the current transaction
+    commits. The request only pays for the publish; a failure is logged, not
+    raised, and the nightly reconcile repairs anything that was missed.
+    """
+    days = set(days) - {None}
+    if days:
+        transaction.on_commit(lambda: _queue_refresh(rollup, days), robust=True)
+
+
+def reconcile(days_back, today=None):
+    """
+    Rebuild the last days_back days of every rollup, plus booked future days
+    of appointments. Catches edits that bypassed the save hooks (queryset
+    updates, raw SQL, a failed hook). Returns {rollup name: rows written}.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days_back)
+    written = {}
+    for rollup in ROLLUPS.values():
+        _, last = rollup.bounds()
+        written[rollup.name] = rollup.rebuild(start, max(today, last or today))
+    return written
@@ -0,0 +1,55 @@
+"""
+Keep the daily rollups current: each save or delete queues a refresh of the days it touched once committed
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.analytics import rollups
+from apps.analytics.models import Feedback
+from apps.appointments.models import Appointment
+from apps.appointments.signals import appointment_status_changed
+from apps.payments.models import Payment, PaymentShortfall
+
+
+def _local_date(value):
+    return timezone.localdate(value) if value else None
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_date(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred field is not loaded just for this
+    instance._rollup_date = instance.__dict__.get('appointment_date')
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    # A reschedule moves the appointment out of its old day as well as into the new one
+    rollups.refresh_later(rollups.APPOINTMENTS, {getattr(instance, '_rollup_date', None), instance.appointment_date})
+    instance._rollup_date = instance.appointment_date
+
+
+@receiver(appointment_status_changed)
+def appointments_bulk_changed(sender, appointment_ids, **kwargs):
+    days = Appointment.objects.filter(id__in=appointment_ids).values_list('appointment_date', flat=True).distinct()
+    rollups.refresh_later(rollups.APPOINTMENTS, set(days))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    rollups.refresh_later(rollups.REVENUE, {_local_date(instance.created_at)})
+
+
+@receiver(post_save, sender=PaymentShortfall)
+@receiver(post_delete, sender=PaymentShortfall)
+def shortfall_changed(sender, instance, **kwargs):
+    created_at = Payment.objects.filter(id=instance.payment_id).values_list('created_at', flat=True).first()
+    rollups.refresh_later(rollups.REVENUE, {_local_date(created_at)})
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def feedback_changed(sender, instance, **kwargs):
+    rollups.refresh_later(rollups.FEEDBACK, {_local_date(instance.created_at)})
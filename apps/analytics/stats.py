@@ -0,0 +1,160 @@
+"""
+Feedback statistics with NumPy: distributions, percentiles, NPS-style scores and bootstrap intervals
+
+Ratings are integers 1-5, so every statistic here is computed from rating
+counts. Counts for all dimensions and scan types come from one bincount over
+the loaded arrays, and the statistics are then evaluated for all of them at
+once. Bootstrap resamples are drawn as multinomial counts, which is the same
+distribution as resampling the rows but costs nothing per row.
+"""
+from datetime import timedelta
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+from django.db.models.functions import Coalesce
+
+from apps.analytics.models import Feedback
+from apps.analytics.queries import start_of
+
+DIMENSIONS = ('overall_satisfaction', 'staff_professionalism', 'facility_cleanliness', 'report_clarity')
+RATING_VALUES = np.arange(1, 6)
+
+# NPS-style score on the 5-point scale: 5 promotes, 1-3 detracts
+PROMOTER_MIN = 5
+DETRACTOR_MAX = 3
+
+
+def to_arrays(rows):
+    """
+    Convert (rating..., scan type id) rows into a rating matrix (rows x
+    DIMENSIONS, 0 where a rating is missing), a scan type index per row and
+    the scan type id for each index.
+    """
+    count = len(rows)
+    ratings = np.fromiter(
+        chain.from_iterable(map(itemgetter(*range(len(DIMENSIONS))), rows)),
+        dtype=np.int32, count=count * len(DIMENSIONS),
+    ).reshape(count, len(DIMENSIONS))
+    codes = {}
+    code = codes.setdefault
+    groups = np.fromiter((code(scan_id, len(codes)) for scan_id in map(itemgetter(-1), rows)), dtype=np.intp, count=count)
+    return ratings, groups, list(codes)
+
+
+def load(start_date, end_date=None):
+    """The window's ratings as arrays (see to_arrays), from one query"""
+    feedback = Feedback.objects.filter(created_at__gte=start_of(start_date))
+    if end_date:
+        feedback = feedback.filter(created_at__lt=start_of(end_date + timedelta(days=1)))
+    # Missing ratings arrive as 0, so every column fits one integer array
+    columns = {dimension: Coalesce(dimension, 0) for dimension in DIMENSIONS}
+    return to_arrays(list(feedback.values_list(*columns.values(), 'appointment__scan_type_id')))
+
+
+def rating_counts(ratings, groups=None, group_count=1):
+    """
+    Counts of each rating per group and dimension, shape (groups, dimensions, 5).
+
+    groups holds a group index per row (0 when omitted). Ratings outside
+    1-5, such as 0 for missing, are not counted.
+    """
+    rows, dimensions = ratings.shape
+    groups = np.zeros(rows, dtype=np.intp) if groups is None else np.asarray(groups, dtype=np.intp)
+    valid = (ratings >= 1) & (ratings <= 5)
+    rating_index = np.where(valid, ratings, 1).astype(np.intp) - 1
+    cell = (groups[:, None] * dimensions + np.arange(dimensions)) * 5 + rating_index
+    counts = np.bincount(cell[valid], minlength=group_count * dimensions * 5)
+    return counts.reshape(group_count, dimensions, 5)
+
+
+def _percentile(counts, n, q):
+    """Smallest rating whose cumulative share reaches q (lower-percentile convention)"""
+    cumulative = np.cumsum(counts, axis=-1)
+    reached = cumulative >= np.ceil(q * n)[..., None]
+    return np.where(n > 0, RATING_VALUES[np.argmax(reached, axis=-1)], np.nan)
+
+
+def summarize_counts(counts, bootstrap=1000, confidence=0.95, seed=None):
+    """
+    Statistics for rating counts of any leading shape (..., 5).
+
+    Returns a dict of arrays with that leading shape: n, mean, std, median,
+    p25, p75, nps, and ci_low/ci_high, a percentile bootstrap interval for
+    the mean (NaN where n is zero).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n = counts.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = counts / n[..., None]
+        mean = shares @ RATING_VALUES
+        std = np.sqrt(np.maximum(shares @ RATING_VALUES ** 2 - mean ** 2, 0))
+        promoters = shares[..., PROMOTER_MIN - 1:].sum(axis=-1)
+        detractors = shares[..., :DETRACTOR_MAX].sum(axis=-1)
+    stats = {
+        'n': n,
+        'mean': mean,
+        'std': std,
+        'median': _percentile(counts, n, 0.5),
+        'p25': _percentile(counts, n, 0.25),
+        'p75': _percentile(counts, n, 0.75),
+        'nps': (promoters - detractors) * 100,
+        'distribution': counts,
+    }
+
+    ci_low = np.full(n.shape, np.nan)
+    ci_high = np.full(n.shape, np.nan)
+    if bootstrap and n.size:
+        rng = np.random.default_rng(seed)
+        flat_n = n.reshape(-1)
+        flat_p = np.where(flat_n[:, None] > 0, shares.reshape(-1, 5), 0.2)
+        flat_p = np.nan_to_num(flat_p, nan=0.2)
+        samples = rng.multinomial(flat_n, flat_p, size=(bootstrap, flat_n.size))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sample_means = (samples @ RATING_VALUES) / flat_n
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.percentile(sample_means, [tail, 100 - tail], axis=0)
+        ci_low = np.where(flat_n > 0, low, np.nan).reshape(n.shape)
+        ci_high = np.where(flat_n > 0, high, np.nan).reshape(n.shape)
+    stats['ci_low'] = ci_low
+    stats['ci_high'] = ci_high
+    return stats
+
+
+def _rows(stats, index, names):
+    """One plain dict per dimension, rounded for display"""
+    result = {}
+    for position, name in enumerate(names):
+        entry = {}
+        for key, values in stats.items():
+            value = values[index + (position,)]
+            if key == 'distribution':
+                entry[key] = {int(rating): int(count) for rating, count in zip(RATING_VALUES, value)}
+            elif key == 'n':
+                entry[key] = int(value)
+            else:
+                entry[key] = None if np.isnan(value) else round(float(value), 2)
+        result[name] = entry
+    return result
+
+
+def feedback_stats(start_date, end_date=None, bootstrap=1000, seed=None):
+    """
+    Per-dimension statistics for the window, overall and per scan type.
+
+    Returns {'overall': {dimension: stats}, 'by_scan_type': {scan type name:
+    {dimension: stats}}}. Costs one feedback query and one scan type query.
+    """
+    from apps.appointments.models import ScanType
+
+    ratings, groups, scan_ids = load(start_date, end_date)
+    overall = summarize_counts(rating_counts(ratings), bootstrap=bootstrap, seed=seed)
+    per_scan = summarize_counts(rating_counts(ratings, groups, len(scan_ids)), bootstrap=bootstrap, seed=seed)
+    names = dict(ScanType.objects.filter(id__in=[scan_id for scan_id in scan_ids if scan_id]).values_list('id', 'name'))
+    return {
+        'overall': _rows(overall, (0,), DIMENSIONS),
+        'by_scan_type': {
+            names.get(scan_id, 'Unassigned'): _rows(per_scan, (index,), DIMENSIONS)
+            for index, scan_id in enumerate(scan_ids)
+        },
+    }
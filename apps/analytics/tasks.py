@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from celery import shared_task
+from django.conf import settings
+
+from apps.jobs.scheduler import periodic_job
+
+
+@shared_task
+@periodic_job(lease=timedelta(hours=2), min_interval=timedelta(hours=1))
+def reconcile_rollups():
+    """Rebuild recent days of the analytics rollups from the raw tables"""
+    from apps.analytics.rollups import reconcile
+    return reconcile(settings.ANALYTICS_RECONCILE_DAYS)
+
+
+@shared_task
+def refresh_rollup(name, days):
+    """Refresh the days (ISO dates) that saves touched in one rollup"""
+    from apps.analytics.rollups import ROLLUPS, clear_pending
+    rollup = ROLLUPS[name]
+    days = [date.fromisoformat(day) for day in days]
+    clear_pending(rollup, days)
+    rollup.refresh_days(days)
+    return len(days)
+
+
+@shared_task
+def run_export(export_id):
+    """Compute one analytics export off the web workers"""
+    from apps.analytics.exports import run
+    return run(export_id)
+
+
+@shared_task
+@periodic_job(lease=timedelta(minutes=10), min_interval=timedelta(minutes=4))
+def sweep_exports():
+    """Requeue lost exports, fail interrupted ones and delete expired files"""
+    from apps.analytics.exports import sweep
+    return sweep()
@@ -0,0 +1,80 @@
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.analytics import rollups
+from apps.analytics.result_cache import data_version
+from apps.analytics.models import Feedback
+from apps.appointments.models import Appointment, ScanType
+from apps.payments.models import Payment
+from apps.users.models import CustomUser
+
+# Session, user, data version, appointment rollup rows, scan type names,
+# revenue sums, feedback sums and the chart tag's data version
+DASHBOARD_QUERIES = 8
+
+
+# Templates resolve static files without a collectstatic manifest
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class AnalyticsDashboardQueryTests(TestCase):
+    """The dashboard reads a fixed number of queries, however many days and scan types it covers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(username='analyst', password='secret', role='staff')
+        cls.patient = CustomUser.objects.create_user(username='patient', password='secret', role='patient')
+        # Created by the first rollup refresh in production
+        data_version()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def seed(self, scan_types, days):
+        today = timezone.localdate()
+        for index in range(scan_types):
+            scan_type = ScanType.objects.create(name=f'Scan {ScanType.objects.count()}', description='',
+                                                base_price=Decimal('500.00'))
+            for offset in range(days):
+                appointment = Appointment.objects.create(
+                    patient=self.patient, scan_type=scan_type, appointment_date=today - timedelta(days=offset),
+                    appointment_time=time(9, index), status=('completed', 'no_show', 'cancelled')[offset % 3],
+                )
+                Payment.objects.create(appointment=appointment, service_charge=Decimal('500.00'),
+                                       patient_co_payment=Decimal('0.00'), payment_method='cash', status='completed',
+                                       transaction_id=f'TX-{appointment.id.hex}')
+                Feedback.objects.create(appointment=appointment, patient=self.patient, overall_satisfaction=4,
+                                        staff_professionalism=5, facility_cleanliness=4)
+        # The save hooks refresh on the workers; rebuild directly here
+        for rollup in rollups.ROLLUPS.values():
+            rollup.rebuild()
+
+    def get_dashboard(self):
+        return self.client.get(reverse('analytics_dashboard'), {'days': 30})
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.seed(scan_types=2, days=3)
+        with self.assertNumQueries(DASHBOARD_QUERIES):
+            response = self.get_dashboard()
+        self.assertEqual(response.context['total_appointments'], 6)
+
+        self.seed(scan_types=4, days=20)
+        cache.clear()
+        with self.assertNumQueries(DASHBOARD_QUERIES):
+            response = self.get_dashboard()
+        self.assertEqual(response.context['total_appointments'], 86)
+        self.assertEqual(len(response.context['scan_breakdown']), 6)
+
+    def test_cached_dashboard_skips_the_analytics_queries(self):
+        self.seed(scan_types=2, days=3)
+        self.get_dashboard()
+        # Session, user and the two data version reads
+        with self.assertNumQueries(4):
+            self.get_dashboard()
@@ -5,4 +5,9 @@ urlpatterns = [
     path('dashboard/', views.analytics_dashboard, name='analytics_dashboard'),
     path('revenue/', views.revenue_report, name='revenue_report'),
     path('feedback/', views.feedback_analysis, name='feedback_analysis'),
+    path('charts/<slug:name>.<slug:file_format>', views.chart_image, name='analytics_chart'),
+    path('revenue/export/', views.request_export, {'kind': 'revenue'}, name='revenue_export'),
+    path('feedback/export/', views.request_export, {'kind': 'feedback'}, name='feedback_export'),
+    path('exports/<uuid:pk>/', views.export_status, name='analytics_export_status'),
+    path('exports/<uuid:pk>/download/', views.download_export, name='analytics_export_download'),
 ]
@@ -1,13 +1,82 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Sum, Avg, Q
-from django.utils import timezone
-from datetime import timedelta
-from apps.appointments.models import Appointment, ScanType
-from apps.payments.models import Payment
-from apps.analytics.models import Feedback
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_http_methods
+from concurrent.futures.process import BrokenProcessPool
+from apps.analytics import charts, queries, stats
+from apps.analytics.exports import queue
+from apps.analytics.forms import AnalyticsExportForm
+from apps.analytics.models import AnalyticsExport
+from apps.analytics.result_cache import cached_result, snap_days
+from mic_radiology.middleware import allow_caching
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Chart URLs carry the data version, so their images can be cached for a year
+CHART_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _days(request, default):
+    """Window length from ?days=, snapped to a supported window"""
+    return snap_days(request.GET.get('days', default), default)
+
+
+def dashboard_data(days):
+    start_date = queries.window_start(days)
+    appointments = queries.appointment_summary(start_date)
+    revenue = queries.revenue_summary(start_date)
+    feedback = queries.feedback_summary(start_date)
+    return {
+        'total_appointments': appointments['total'],
+        'completed_appointments': appointments['completed'],
+        'missed_appointments': appointments['missed'],
+        'cancelled_appointments': appointments['cancelled'],
+        'missed_rate': appointments['missed_rate'],
+        'completion_rate': appointments['completion_rate'],
+        'scan_breakdown': appointments['scan_breakdown'],
+        'total_revenue': revenue['total_revenue'] or 0,
+        'pending_revenue': revenue['pending_revenue'] or 0,
+        'avg_satisfaction': round(feedback['avg_overall'] or 0, 1),
+        'would_recommend_rate': feedback['recommend_rate'],
+        'shortfalls': {'total_shortfall': revenue['total_shortfall'], 'count': revenue['shortfall_count']},
+        'time_range_days': days,
+    }
+
+
+def revenue_data(days):
+    start_date = queries.window_start(days)
+    return {
+        'revenue_by_scan': queries.revenue_by_scan(start_date),
+        'daily_revenue_json': json.dumps(queries.daily_revenue(start_date), cls=DjangoJSONEncoder),
+        'payment_method_breakdown': queries.payment_method_breakdown(start_date),
+        'time_range_days': days,
+    }
+
+
+def feedback_data(days):
+    start_date = queries.window_start(days)
+    feedback = queries.feedback_summary(start_date)
+    return {
+        'total_feedback': feedback['total'],
+        'avg_overall': round(feedback['avg_overall'] or 0, 1),
+        'avg_staff': round(feedback['avg_staff'] or 0, 1),
+        'avg_cleanliness': round(feedback['avg_cleanliness'] or 0, 1),
+        'avg_report': round(feedback['avg_report'] or 0, 1),
+        'rating_distribution': feedback['rating_distribution'],
+        'would_recommend': feedback['would_recommend'],
+        'would_not_recommend': feedback['would_not_recommend'],
+        'recommend_rate': feedback['recommend_rate'],
+        # Medians, percentiles, NPS-style scores and 95% intervals, overall and per scan type
+        'rating_stats': stats.feedback_stats(start_date),
+        'time_range_days': days,
+    }
+
 
 @login_required(login_url='login')
 def analytics_dashboard(request):
@@ -16,65 +85,8 @@ def analytics_dashboard(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    # Time range filter
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Appointments data
-    appointments = Appointment.objects.filter(appointment_date__gte=start_date)
-    
-    total_appointments = appointments.count()
-    completed_appointments = appointments.filter(status='completed').count()
-    missed_appointments = appointments.filter(status='no_show').count()
-    cancelled_appointments = appointments.filter(status='cancelled').count()
-    
-    missed_rate = (missed_appointments / total_appointments * 100) if total_appointments > 0 else 0
-    completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
-    
-    # Scan types breakdown
-    scan_breakdown = appointments.values('scan_type__name').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Revenue data
-    payments = Payment.objects.filter(created_at__gte=start_date)
-    total_revenue = payments.filter(status='completed').aggregate(Sum('service_charge'))['service_charge__sum'] or 0
-    pending_revenue = payments.filter(status='pending').aggregate(Sum('service_charge'))['service_charge__sum'] or 0
-    
-    # Feedback data
-    feedback_records = Feedback.objects.filter(created_at__gte=start_date)
-    avg_satisfaction = feedback_records.aggregate(Avg('overall_satisfaction'))['overall_satisfaction__avg'] or 0
-    would_recommend_count = feedback_records.filter(would_recommend=True).count()
-    
-    # Daily appointments trend
-    daily_data = appointments.extra(
-        select={'date': 'DATE(appointment_date)'}
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')
-    
-    # Payment shortfalls
-    shortfalls = payments.filter(shortfall__isnull=False).aggregate(
-        total_shortfall=Sum('shortfall__shortfall_amount'),
-        count=Count('shortfall')
-    )
-    
-    context = {
-        'total_appointments': total_appointments,
-        'completed_appointments': completed_appointments,
-        'missed_appointments': missed_appointments,
-        'cancelled_appointments': cancelled_appointments,
-        'missed_rate': round(missed_rate, 1),
-        'completion_rate': round(completion_rate, 1),
-        'scan_breakdown': list(scan_breakdown),
-        'total_revenue': total_revenue,
-        'pending_revenue': pending_revenue,
-        'avg_satisfaction': round(avg_satisfaction, 1),
-        'would_recommend_rate': round((would_recommend_count / feedback_records.count() * 100) if feedback_records.count() > 0 else 0, 1),
-        'daily_data_json': json.dumps(list(daily_data)),
-        'shortfalls': shortfalls,
-        'time_range_days': days,
-    }
+    days = _days(request, 30)
+    context = dict(cached_result('dashboard', days, lambda: dashboard_data(days)), chart_tag=charts.current_tag())
     
     return render(request, 'analytics/dashboard.html', context)
 
@@ -86,42 +98,11 @@ def revenue_report(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    days = int(request.GET.get('days', 90))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    payments = Payment.objects.filter(created_at__gte=start_date)
-    
-    # Revenue by scan type
-    revenue_by_scan = payments.filter(status='completed').values(
-        'appointment__scan_type__name'
-    ).annotate(
-        total_revenue=Sum('service_charge'),
-        count=Count('id'),
-        avg_amount=Avg('service_charge')
-    ).order_by('-total_revenue')
-    
-    # Revenue trend
-    daily_revenue = payments.filter(status='completed').extra(
-        select={'date': 'DATE(created_at)'}
-    ).values('date').annotate(
-        total=Sum('service_charge'),
-        count=Count('id')
-    ).order_by('date')
-    
-    # Payment method breakdown
-    payment_method_breakdown = payments.filter(status='completed').values(
-        'payment_method'
-    ).annotate(
-        total=Sum('service_charge'),
-        count=Count('id')
-    ).order_by('-total')
-    
-    context = {
-        'revenue_by_scan': list(revenue_by_scan),
-        'daily_revenue_json': json.dumps(list(daily_revenue)),
-        'payment_method_breakdown': list(payment_method_breakdown),
-        'time_range_days': days,
-    }
+    days = _days(request, 90)
+    context = dict(
+        cached_result('revenue', days, lambda: revenue_data(days)),
+        export_url=reverse('revenue_export'), chart_tag=charts.current_tag(),
+    )
     
     return render(request, 'analytics/revenue_report.html', context)
 
@@ -133,37 +114,104 @@ def feedback_analysis(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    feedback = Feedback.objects.filter(created_at__gte=start_date)
-    
-    # Average ratings
-    avg_overall = feedback.aggregate(Avg('overall_satisfaction'))['overall_satisfaction__avg'] or 0
-    avg_staff = feedback.aggregate(Avg('staff_professionalism'))['staff_professionalism__avg'] or 0
-    avg_cleanliness = feedback.aggregate(Avg('facility_cleanliness'))['facility_cleanliness__avg'] or 0
-    avg_report = feedback.aggregate(Avg('report_clarity'))['report_clarity__avg'] or 0
-    
-    # Rating distribution
-    rating_distribution = {}
-    for rating in range(1, 6):
-        rating_distribution[rating] = feedback.filter(overall_satisfaction=rating).count()
-    
-    # Recommendations
-    would_recommend = feedback.filter(would_recommend=True).count()
-    would_not_recommend = feedback.filter(would_recommend=False).count()
-    
-    context = {
-        'total_feedback': feedback.count(),
-        'avg_overall': round(avg_overall, 1),
-        'avg_staff': round(avg_staff, 1),
-        'avg_cleanliness': round(avg_cleanliness, 1),
-        'avg_report': round(avg_report, 1),
-        'rating_distribution': rating_distribution,
-        'would_recommend': would_recommend,
-        'would_not_recommend': would_not_recommend,
-        'recommend_rate': round((would_recommend / feedback.count() * 100) if feedback.count() > 0 else 0, 1),
-        'time_range_days': days,
-    }
+    days = _days(request, 30)
+    context = dict(cached_result('feedback', days, lambda: feedback_data(days)), export_url=reverse('feedback_export'))
     
     return render(request, 'analytics/feedback_analysis.html', context)
+
+
+@login_required(login_url='login')
+def chart_image(request, name, file_format):
+    """
+    A server-rendered analytics chart (staff only).
+
+    Served only under the current ?v= tag; any other tag redirects there, so
+    the image at a given URL never changes and browsers keep it.
+    """
+    if not request.user.is_staff_user() and not request.user.is_superuser:
+        return HttpResponseForbidden()
+    if name not in charts.CHARTS or file_format not in charts.FORMATS:
+        raise Http404('Unknown chart')
+
+    days = _days(request, 30)
+    tag = charts.current_tag()
+    if request.GET.get('v') != tag:
+        return redirect(f"{reverse('analytics_chart', args=[name, file_format])}?days={days}&v={tag}")
+    try:
+        path = charts.render(name, days, file_format, tag)
+    except (TimeoutError, BrokenProcessPool):
+        logger.warning('Could not render analytics chart %s', name, exc_info=True)
+        response = HttpResponse('Chart is being prepared, please retry.', status=503, content_type='text/plain')
+        response['Retry-After'] = '5'
+        return response
+
+    response = FileResponse(path.open('rb'), content_type=charts.FORMATS[file_format])
+    patch_cache_control(response, private=True, max_age=CHART_MAX_AGE, immutable=True)
+    return allow_caching(response)
+
+
+def _export_json(export):
+    data = {
+        'id': str(export.id),
+        'kind': export.kind,
+        'status': export.status,
+        'start_date': export.start_date.isoformat(),
+        'end_date': export.end_date.isoformat(),
+        'file_format': export.file_format,
+        'status_url': reverse('analytics_export_status', args=[export.id]),
+    }
+    if export.status == 'succeeded':
+        data.update(
+            source_rows=export.source_rows,
+            result_rows=export.result_rows,
+            download_url=reverse('analytics_export_download', args=[export.id]),
+        )
+    elif export.status == 'failed':
+        data['error'] = export.error
+    return data
+
+
+def _user_export(request, pk):
+    exports = AnalyticsExport.objects.all()
+    if not request.user.is_superuser:
+        exports = exports.filter(requested_by=request.user)
+    return get_object_or_404(exports, id=pk)
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def request_export(request, kind):
+    """
+    Queue a long-range revenue or feedback export (staff only).
+
+    The analysis runs on the bulk Celery workers; poll the returned
+    status_url until it reports a download_url.
+    """
+    if not request.user.is_staff_user() and not request.user.is_superuser:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    form = AnalyticsExportForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    export = form.save(commit=False)
+    export.kind = kind
+    export.requested_by = request.user
+    export.save()
+    queue(export)
+    return JsonResponse(_export_json(export), status=202)
+
+
+@login_required(login_url='login')
+def export_status(request, pk):
+    """Status of one of the user's exports, for polling"""
+    return JsonResponse(_export_json(_user_export(request, pk)))
+
+
+@login_required(login_url='login')
+def download_export(request, pk):
+    """Download a finished export"""
+    export = _user_export(request, pk)
+    if export.status != 'succeeded' or not export.file:
+        raise Http404('Export not ready')
+    content_type = 'text/csv' if export.file_format == 'csv' else 'application/vnd.apache.parquet'
+    return FileResponse(export.file.open('rb'), content_type=content_type, as_attachment=True,
+                        filename=export.file.name.rsplit('/', 1)[-1])
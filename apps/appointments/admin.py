@@ -1,9 +1,9 @@
 from django.contrib import admin
-from apps.appointments.models import Appointment, ScanType, MedicalAidCoverage
+from apps.appointments.models import Appointment, AppointmentStatusChange, ScanType, MedicalAidCoverage
 
 @admin.register(ScanType)
 class ScanTypeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'base_price', 'estimated_duration_minutes', 'is_active')
+    list_display = ('name', 'base_price', 'estimated_duration_minutes', 'capacity', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('name',)
 
@@ -37,6 +37,13 @@ class AppointmentAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(AppointmentStatusChange)
+class AppointmentStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('appointment', 'old_status', 'new_status', 'changed_by', 'source', 'created_at')
+    list_filter = ('new_status', 'source', 'created_at')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(MedicalAidCoverage)
 class MedicalAidCoverageAdmin(admin.ModelAdmin):
     list_display = ('medical_aid_name', 'coverage_percentage', 'requires_authorization', 'is_active')
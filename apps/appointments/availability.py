@@ -0,0 +1,220 @@
+"""
+Slot availability engine backed by the per-day SlotOccupancy index
+"""
+import math
+from collections import Counter
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.appointments.models import Appointment, SlotOccupancy
+
+# Appointments in these states hold their scanner slots
+OCCUPYING_STATUSES = ('pending', 'confirmed', 'completed')
+
+
+class SlotUnavailable(Exception):
+    """Raised when a booking does not fit in the scan type's free capacity"""
+
+
+def _minutes(value):
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def clinic_hours():
+    """Return (opening, closing) as minutes since midnight"""
+    return _minutes(settings.CLINIC_OPENING_TIME), _minutes(settings.CLINIC_CLOSING_TIME)
+
+
+def slots_per_day():
+    opening, closing = clinic_hours()
+    return (closing - opening) // settings.APPOINTMENT_SLOT_MINUTES
+
+
+def slot_time(index):
+    """Start time of a slot index"""
+    minutes = clinic_hours()[0] + index * settings.APPOINTMENT_SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def slot_span(duration_minutes, appointment_time):
+    """Return the [first, last) slot indexes an appointment of this length occupies"""
+    step = settings.APPOINTMENT_SLOT_MINUTES
+    opening, closing = clinic_hours()
+    start = appointment_time.hour * 60 + appointment_time.minute - opening
+    first = start // step
+    last = math.ceil((start + max(duration_minutes or 0, 1)) / step)
+    if start < 0 or last > slots_per_day():
+        raise SlotUnavailable(
+            f"Appointments must fit between {settings.CLINIC_OPENING_TIME} and {settings.CLINIC_CLOSING_TIME}."
+        )
+    return first, last
+
+
+def occupancy_counts(rows):
+    """
+    Build occupancy counts from (scan_type_id, duration_minutes, date, time) rows.
+
+    Rows falling outside clinic hours are skipped, they never held a slot.
+    """
+    counts = Counter()
+    for scan_type_id, duration, appointment_date, appointment_time in rows:
+        try:
+            first, last = slot_span(duration, appointment_time)
+        except SlotUnavailable:
+            continue
+        for index in range(first, last):
+            counts[(scan_type_id, appointment_date, index)] += 1
+    return counts
+
+
+def reserve_slot(scan_type, appointment_date, appointment_time):
+    """
+    Take one unit of capacity on every slot the appointment spans.
+
+    The conditional UPDATE only touches slots still below capacity, so two
+    concurrent bookings can never both take the last place; a short count
+    raises SlotUnavailable and rolls the partial increment back.
+    """
+    first, last = slot_span(scan_type.estimated_duration_minutes, appointment_time)
+    with transaction.atomic():
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(scan_type=scan_type, date=appointment_date, slot_index=index)
+            for index in range(first, last)
+        ], ignore_conflicts=True)
+        reserved = SlotOccupancy.objects.filter(
+            scan_type=scan_type,
+            date=appointment_date,
+            slot_index__gte=first,
+            slot_index__lt=last,
+            booked__lt=scan_type.capacity,
+        ).update(booked=F('booked') + 1)
+        if reserved != last - first:
+            raise SlotUnavailable(
+                f"{scan_type.name} is fully booked at {appointment_time:%H:%M} on {appointment_date}. "
+                "Please choose another time."
+            )
+
+
+def release_slot(scan_type, appointment_date, appointment_time):
+    """Give back the capacity held by an appointment"""
+    try:
+        first, last = slot_span(scan_type.estimated_duration_minutes, appointment_time)
+    except SlotUnavailable:
+        return
+    SlotOccupancy.objects.filter(
+        scan_type=scan_type,
+        date=appointment_date,
+        slot_index__gte=first,
+        slot_index__lt=last,
+        booked__gt=0,
+    ).update(booked=F('booked') - 1)
+
+
+def release_slots(appointments):
+    """Release many appointments, one UPDATE per distinct slot span"""
+    spans = Counter()
+    for appointment in appointments:
+        if not appointment.scan_type:
+            continue
+        try:
+            first, last = slot_span(appointment.scan_type.estimated_duration_minutes, appointment.appointment_time)
+        except SlotUnavailable:
+            continue
+        spans[(appointment.scan_type_id, appointment.appointment_date, first, last)] += 1
+    for (scan_type_id, appointment_date, first, last), count in spans.items():
+        SlotOccupancy.objects.filter(
+            scan_type_id=scan_type_id,
+            date=appointment_date,
+            slot_index__gte=first,
+            slot_index__lt=last,
+            booked__gte=count,
+        ).update(booked=F('booked') - count)
+
+
+def sync_occupancy(appointment, old_status=None, old_date=None, old_time=None):
+    """
+    Bring the index in line with a booking, cancellation or reschedule.
+
+    Call inside the transaction that saves the appointment, with the values
+    the appointment had before the change (old_status=None for new bookings).
+    """
+    if not appointment.scan_type:
+        return
+    old_date = old_date or appointment.appointment_date
+    old_time = old_time or appointment.appointment_time
+    was_holding = old_status in OCCUPYING_STATUSES
+    holding = appointment.status in OCCUPYING_STATUSES
+    moved = (old_date, old_time) != (appointment.appointment_date, appointment.appointment_time)
+
+    if was_holding and (moved or not holding):
+        release_slot(appointment.scan_type, old_date, old_time)
+    if holding and (moved or not was_holding):
+        reserve_slot(appointment.scan_type, appointment.appointment_date, appointment.appointment_time)
+
+
+def free_slots(scan_type, start_date, days):
+    """
+    Return {date: [start times]} where the scan type still has room.
+
+    Only full slots are read from the index, so the cost is bounded by the
+    number of fully booked slots in the window, not by the appointment count.
+    """
+    step = settings.APPOINTMENT_SLOT_MINUTES
+    total = slots_per_day()
+    span = max(math.ceil(max(scan_type.estimated_duration_minutes, 1) / step), 1)
+    end_date = start_date + timedelta(days=days)
+
+    full = {}
+    for slot_date, index in SlotOccupancy.objects.filter(
+        scan_type=scan_type,
+        date__gte=start_date,
+        date__lt=end_date,
+        booked__gte=scan_type.capacity,
+    ).values_list('date', 'slot_index'):
+        full.setdefault(slot_date, set()).add(index)
+
+    now = timezone.localtime()
+    earliest_today = math.ceil((now.hour * 60 + now.minute - clinic_hours()[0]) / step)
+
+    result = {}
+    for offset in range(days):
+        slot_date = start_date + timedelta(days=offset)
+        blocked = full.get(slot_date, set())
+        first = max(earliest_today, 0) if slot_date == now.date() else 0
+        result[slot_date] = [
+            slot_time(index)
+            for index in range(first, total - span + 1)
+            if blocked.isdisjoint(range(index, index + span))
+        ]
+    return result
+
+
+def rebuild_occupancy(start_date=None, scan_type=None):
+    """Recompute the index from the Appointment table (from start_date on and for one scan type, if given)"""
+    appointments = Appointment.objects.filter(
+        scan_type__isnull=False,
+        status__in=OCCUPYING_STATUSES,
+    )
+    occupancy = SlotOccupancy.objects.all()
+    if start_date:
+        appointments = appointments.filter(appointment_date__gte=start_date)
+        occupancy = occupancy.filter(date__gte=start_date)
+    if scan_type:
+        appointments = appointments.filter(scan_type=scan_type)
+        occupancy = occupancy.filter(scan_type=scan_type)
+
+    counts = occupancy_counts(appointments.values_list(
+        'scan_type_id', 'scan_type__estimated_duration_minutes', 'appointment_date', 'appointment_time'
+    ).iterator())
+    with transaction.atomic():
+        occupancy.delete()
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(scan_type_id=scan_type_id, date=slot_date, slot_index=index, booked=booked)
+            for (scan_type_id, slot_date, index), booked in counts.items()
+        ], batch_size=1000)
+    return len(counts)
@@ -0,0 +1,32 @@
+import django_filters
+from django import forms
+from apps.appointments.models import Appointment, ScanType
+from apps.users.models import CustomUser
+
+class AppointmentFilter(django_filters.FilterSet):
+    """Date range, modality, doctor and status filters for appointment lists"""
+
+    date_from = django_filters.DateFilter(
+        field_name='appointment_date', lookup_expr='gte',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = django_filters.DateFilter(
+        field_name='appointment_date', lookup_expr='lte',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    modality = django_filters.ModelChoiceFilter(
+        field_name='scan_type', queryset=ScanType.objects.all(), empty_label='All scan types',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    doctor = django_filters.ModelChoiceFilter(
+        field_name='referring_doctor', queryset=CustomUser.objects.filter(role='doctor'), empty_label='All doctors',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    status = django_filters.ChoiceFilter(
+        choices=Appointment.STATUS_CHOICES, empty_label='All statuses',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    class Meta:
+        model = Appointment
+        fields = ('date_from', 'date_to', 'modality', 'doctor', 'status')
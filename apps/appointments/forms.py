@@ -79,9 +79,11 @@ class AppointmentEditForm(forms.ModelForm):
     
     class Meta:
         model = Appointment
-        fields = ('status', 'clinical_notes')
+        fields = ('status', 'appointment_date', 'appointment_time', 'clinical_notes')
         widgets = {
             'status': forms.Select(attrs={'class': 'form-control'}),
+            'appointment_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'appointment_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'clinical_notes': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 4
@@ -108,11 +110,12 @@ class ScanTypeForm(forms.ModelForm):
     """Form for receptionist to add or edit ScanType"""
     class Meta:
         model = ScanType
-        fields = ('name', 'description', 'base_price', 'estimated_duration_minutes', 'is_active')
+        fields = ('name', 'description', 'base_price', 'estimated_duration_minutes', 'capacity', 'is_active')
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'base_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'estimated_duration_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
+            'capacity': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.appointments.availability import rebuild_occupancy
+
+class Command(BaseCommand):
+    help = 'Rebuild the slot occupancy index from existing appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start_date', help='Only rebuild from this date on (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start_date = None
+        if options['start_date']:
+            try:
+                start_date = date.fromisoformat(options['start_date'])
+            except ValueError:
+                raise CommandError('--from must be a date in YYYY-MM-DD format')
+
+        slots = rebuild_occupancy(start_date)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt occupancy for {slots} slots'))
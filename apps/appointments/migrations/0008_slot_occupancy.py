@@ -0,0 +1,78 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:48
+
+import django.db.models.deletion
+import math
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copies of the availability rules as of this migration, so later
+# changes to apps.appointments.availability cannot alter the backfill
+OCCUPYING_STATUSES = ('pending', 'confirmed', 'completed')
+
+
+def _minutes(value):
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def build_occupancy(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    SlotOccupancy = apps.get_model('appointments', 'SlotOccupancy')
+    step = settings.APPOINTMENT_SLOT_MINUTES
+    opening = _minutes(settings.CLINIC_OPENING_TIME)
+    slots = (_minutes(settings.CLINIC_CLOSING_TIME) - opening) // step
+
+    counts = Counter()
+    rows = Appointment.objects.filter(
+        scan_type__isnull=False,
+        status__in=OCCUPYING_STATUSES,
+    ).values_list('scan_type_id', 'scan_type__estimated_duration_minutes', 'appointment_date', 'appointment_time')
+    for scan_type_id, duration, appointment_date, appointment_time in rows.iterator():
+        start = appointment_time.hour * 60 + appointment_time.minute - opening
+        last = math.ceil((start + max(duration or 0, 1)) / step)
+        if start < 0 or last > slots:
+            continue  # Outside clinic hours, never held a slot
+        for index in range(start // step, last):
+            counts[(scan_type_id, appointment_date, index)] += 1
+
+    SlotOccupancy.objects.bulk_create([
+        SlotOccupancy(scan_type_id=scan_type_id, date=slot_date, slot_index=index, booked=booked)
+        for (scan_type_id, slot_date, index), booked in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_rename_patient_date_of_birth_appointment_date_of_birth_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scantype',
+            name='capacity',
+            field=models.PositiveIntegerField(default=1, help_text='Number of patients that can be scanned at the same time'),
+        ),
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('slot_index', models.PositiveSmallIntegerField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('scan_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='appointments.scantype')),
+            ],
+            options={
+                'ordering': ['date', 'slot_index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slotoccupancy',
+            constraint=models.UniqueConstraint(fields=('scan_type', 'date', 'slot_index'), name='unique_slot_occupancy'),
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
@@ -18,6 +18,7 @@ class ScanType(models.Model):
     description = models.TextField()
     base_price = models.DecimalField(max_digits=10, decimal_places=2)
     estimated_duration_minutes = models.IntegerField(default=30)
+    capacity = models.PositiveIntegerField(default=1, help_text="Number of patients that can be scanned at the same time")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -72,6 +73,10 @@ class Appointment(models.Model):
     reminder_sent = models.BooleanField(default=False)
     reminder_sent_at = models.DateTimeField(blank=True, null=True)
     
+    # Lease held by a sweep worker (apps.jobs.claims); free when claimed_until is null or past
+    claim_token = models.CharField(max_length=32, blank=True, editable=False)
+    claimed_until = models.DateTimeField(blank=True, null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -80,6 +85,10 @@ class Appointment(models.Model):
         indexes = [
             models.Index(fields=['patient', 'appointment_date']),
             models.Index(fields=['status']),
+            models.Index(fields=['appointment_date', 'appointment_time', 'id']),
+            models.Index(fields=['claim_token']),
+            # Covers the analytics window aggregates (status counts, per-scan and per-day groupings)
+            models.Index(fields=['appointment_date', 'status', 'scan_type'], name='appt_date_status_scan_idx'),
         ]
     
     def __str__(self):
@@ -106,6 +115,49 @@ class Appointment(models.Model):
         return time_until_appointment > timedelta(hours=24)
 
 
+class AppointmentStatusChange(models.Model):
+    """
+    Status transition history, written by bulk updates that bypass save()
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='status_changes')
+    old_status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    new_status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    changed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='appointment_status_changes')
+    source = models.CharField(max_length=30, blank=True)  # e.g. missed_sweep, bulk_action
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['new_status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.appointment_id}: {self.old_status} -> {self.new_status}"
+
+
+class SlotOccupancy(models.Model):
+    """
+    Precomputed booking count per scanner slot, kept in step with bookings
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    scan_type = models.ForeignKey(ScanType, on_delete=models.CASCADE, related_name='slot_occupancy')
+    date = models.DateField()
+    slot_index = models.PositiveSmallIntegerField()  # Offset from opening time in APPOINTMENT_SLOT_MINUTES steps
+    booked = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['date', 'slot_index']
+        constraints = [
+            models.UniqueConstraint(fields=['scan_type', 'date', 'slot_index'], name='unique_slot_occupancy'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scan_type.name} {self.date} slot {self.slot_index}: {self.booked}"
+
+
 class MedicalAidCoverage(models.Model):
     """
     Medical aid coverage details for payment calculations
@@ -0,0 +1,55 @@
+"""
+Status change hook for bulk appointment updates, and occupancy upkeep for scan type edits
+"""
+from django.db.models.signals import post_init, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from apps.appointments.availability import rebuild_occupancy
+from apps.appointments.models import Appointment, AppointmentStatusChange, ScanType
+
+# Sent after a set of appointments moved from old_status to new_status without save().
+# Receivers get appointment_ids, old_status, new_status, changed_by and source.
+appointment_status_changed = Signal()
+
+
+def record_status_change(appointment_ids, old_status, new_status, changed_by=None, source=''):
+    """Write the transition history for a batch and notify listeners such as analytics"""
+    if not appointment_ids:
+        return
+    AppointmentStatusChange.objects.bulk_create([
+        AppointmentStatusChange(
+            appointment_id=appointment_id,
+            old_status=old_status,
+            new_status=new_status,
+            changed_by=changed_by,
+            source=source,
+        )
+        for appointment_id in appointment_ids
+    ], batch_size=500)
+    appointment_status_changed.send(
+        sender=Appointment,
+        appointment_ids=list(appointment_ids),
+        old_status=old_status,
+        new_status=new_status,
+        changed_by=changed_by,
+        source=source,
+    )
+
+
+def _slot_settings(instance):
+    # Read from __dict__ so a deferred field is not loaded just for this
+    return instance.__dict__.get('estimated_duration_minutes'), instance.__dict__.get('capacity')
+
+
+@receiver(post_init, sender=ScanType)
+def remember_slot_settings(sender, instance, **kwargs):
+    instance._slot_settings = _slot_settings(instance)
+
+
+@receiver(post_save, sender=ScanType)
+def scan_type_changed(sender, instance, created, **kwargs):
+    # A new duration changes how many slots every booking spans; rebuild the days still ahead
+    if not created and instance._slot_settings != _slot_settings(instance):
+        rebuild_occupancy(timezone.localdate(), scan_type=instance)
+    instance._slot_settings = _slot_settings(instance)
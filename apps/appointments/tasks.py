@@ -1,48 +1,124 @@
 """
 Appointment Reminders Task Scheduler
+
+The scheduled sweeps fan out to APPOINTMENT_SWEEP_WORKERS worker tasks. Each
+worker claims chunks of due appointments (apps.jobs.claims), processes them
+and releases them, so a sweep spreads across every worker on the bulk queue
+and no appointment is handled twice.
 """
 from celery import shared_task
-from celery.schedules import crontab
+from apps.appointments.availability import release_slots
 from apps.appointments.models import Appointment
+from apps.appointments.signals import record_status_change
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
+from apps.jobs import claims
+from apps.jobs.scheduler import periodic_job, tracked_job
+
+REMINDER_BATCH_SIZE = 200
+MISSED_BATCH_SIZE = 500
+
+
+def _lease():
+    return timedelta(seconds=settings.APPOINTMENT_CLAIM_LEASE_SECONDS)
+
+
+def reminders_due():
+    tomorrow = (timezone.now() + timedelta(days=1)).date()
+    return Appointment.objects.filter(appointment_date=tomorrow, status__in=['pending', 'confirmed'], reminder_sent=False)
+
+
+def missed_due():
+    return Appointment.objects.filter(appointment_date__lt=timezone.now().date(), status='confirmed')
+
+
+def remind_claimed(batch_size=REMINDER_BATCH_SIZE):
+    """
+    Claim chunks of due reminders until none are left.
+
+    Each chunk gets its Notification rows and is stamped reminder_sent in one
+    transaction, then emailed over a single mail connection and texted as one
+    rate-limited SMS batch. Returns the number sent by this worker.
+    """
+    from apps.notifications.fanout import deliver
+    from apps.notifications.tasks import create_reminder_notifications
+
+    total = 0
+    while True:
+        token, ids = claims.claim(reminders_due(), batch_size, _lease())
+        if not ids:
+            return total
+        batch = list(Appointment.objects.filter(claim_token=token).select_related('patient', 'scan_type').order_by('id'))
+        with transaction.atomic():
+            notifications = create_reminder_notifications(batch)
+            claims.release(Appointment, token, reminder_sent=True, reminder_sent_at=timezone.now())
+        deliver(notifications)
+        total += len(batch)
+
+
+def mark_claimed_missed(batch_size=MISSED_BATCH_SIZE):
+    """
+    Claim chunks of past confirmed appointments and mark them no-shows.
+
+    A claimed row that someone completed or cancelled meanwhile is released
+    untouched. Returns the number marked by this worker.
+    """
+    total = 0
+    while True:
+        token, ids = claims.claim(missed_due(), batch_size, _lease())
+        if not ids:
+            return total
+        with transaction.atomic():
+            missed = list(
+                Appointment.objects.select_for_update(of=('self',))
+                .filter(claim_token=token, status='confirmed')
+                .select_related('scan_type')
+            )
+            missed_ids = [appointment.id for appointment in missed]
+            updated = Appointment.objects.filter(id__in=missed_ids).update(status='no_show', updated_at=timezone.now())
+            # no_show does not hold a slot (OCCUPYING_STATUSES); give it back as the bulk action does
+            release_slots(missed)
+            record_status_change(missed_ids, 'confirmed', 'no_show', source='missed_sweep')
+            claims.release(Appointment, token)
+        total += updated
+
+
+def _fan_out(worker, due, batch_size):
+    """Start sweep workers, no more than there are chunks of due rows"""
+    count = due.count()
+    if not count:
+        return {'rows': 0, 'workers': 0}
+    workers = min(settings.APPOINTMENT_SWEEP_WORKERS, -(-count // batch_size))
+    for _ in range(workers):
+        worker.delay(batch_size)
+    return {'rows': count, 'workers': workers}
+
 
 @shared_task
+@tracked_job()
+def remind_worker(batch_size=REMINDER_BATCH_SIZE):
+    """One reminder sweep worker"""
+    return remind_claimed(batch_size)
+
+
+@shared_task
+@tracked_job()
+def missed_worker(batch_size=MISSED_BATCH_SIZE):
+    """One no-show sweep worker"""
+    return mark_claimed_missed(batch_size)
+
+
+@shared_task
+@periodic_job(lease=timedelta(hours=2), min_interval=timedelta(hours=1))
 def send_appointment_reminders():
     """Send reminders for appointments tomorrow"""
-    tomorrow = (timezone.now() + timedelta(days=1)).date()
-    appointments = Appointment.objects.filter(
-        appointment_date=tomorrow,
-        status__in=['pending', 'confirmed']
-    )
-    
-    for appointment in appointments:
-        from apps.notifications.tasks import send_appointment_reminder
-        send_appointment_reminder.delay(str(appointment.id))
+    return _fan_out(remind_worker, reminders_due(), REMINDER_BATCH_SIZE)
 
 
 @shared_task
+@periodic_job(lease=timedelta(hours=1), min_interval=timedelta(hours=1))
 def check_missed_appointments():
-    """Check and mark missed appointments"""
-    now = timezone.now()
-    missed = Appointment.objects.filter(
-        appointment_date__lt=now.date(),
-        status='confirmed'
-    )
-    
-    for appointment in missed:
-        appointment.status = 'no_show'
-        appointment.save()
-
-
-# Celery Beat Schedule (add to settings.py for periodic tasks)
-CELERY_BEAT_SCHEDULE = {
-    'send-appointment-reminders': {
-        'task': 'apps.appointments.tasks.send_appointment_reminders',
-        'schedule': crontab(hour=9, minute=0),  # 9 AM daily
-    },
-    'check-missed-appointments': {
-        'task': 'apps.appointments.tasks.check_missed_appointments',
-        'schedule': crontab(hour=18, minute=0),  # 6 PM daily
-    },
-}
+    """Mark past confirmed appointments as no-shows"""
+    return _fan_out(missed_worker, missed_due(), MISSED_BATCH_SIZE)
@@ -0,0 +1,102 @@
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.appointments.availability import sync_occupancy
+from apps.appointments.forms import ScanTypeForm
+from apps.appointments.models import Appointment, ScanType, SlotOccupancy
+from apps.appointments.tasks import mark_claimed_missed, missed_worker
+from apps.jobs.models import JobRun
+from apps.users.models import CustomUser
+
+
+@mock.patch('apps.appointments.views.dispatch')
+class NoShowOccupancyTests(TestCase):
+    """A no-show gives its slot back, and completing it later re-reserves or reports a clash"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(username='staff', password='secret', role='staff')
+        cls.patient = CustomUser.objects.create_user(username='patient', password='secret', role='patient')
+        cls.scan_type = ScanType.objects.create(name='MRI', description='', base_price=Decimal('900.00'),
+                                                estimated_duration_minutes=30, capacity=1)
+        cls.yesterday = timezone.localdate() - timedelta(days=1)
+
+    def book(self, status='confirmed'):
+        appointment = Appointment(patient=self.patient, scan_type=self.scan_type, appointment_date=self.yesterday,
+                                  appointment_time=time(9, 0), status=status)
+        with transaction.atomic():
+            appointment.save()
+            sync_occupancy(appointment)
+        return appointment
+
+    def booked(self):
+        return list(SlotOccupancy.objects.filter(scan_type=self.scan_type, date=self.yesterday)
+                    .order_by('slot_index').values_list('booked', flat=True))
+
+    def mark_completed(self, appointment):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('mark_appointment_completed', args=[appointment.id]))
+
+    def test_missed_sweep_releases_the_slot(self, dispatch):
+        self.book()
+        self.assertEqual(self.booked(), [1, 1])
+        self.assertEqual(mark_claimed_missed(), 1)
+        self.assertEqual(self.booked(), [0, 0])
+
+    def test_sweep_worker_records_its_run(self, dispatch):
+        self.book()
+        self.assertEqual(missed_worker(), 1)
+        run = JobRun.objects.get(name='apps.appointments.tasks.missed_worker')
+        self.assertEqual((run.status, run.rows), ('succeeded', 1))
+        self.assertIsNotNone(run.duration_ms)
+
+    def test_no_show_can_be_marked_completed(self, dispatch):
+        appointment = self.book()
+        mark_claimed_missed()
+        response = self.mark_completed(appointment)
+        self.assertRedirects(response, reverse('appointment_detail', args=[appointment.id]),
+                             fetch_redirect_response=False)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'completed')
+        self.assertEqual(self.booked(), [1, 1])
+
+    def test_completing_into_a_rebooked_slot_shows_an_error(self, dispatch):
+        appointment = self.book()
+        mark_claimed_missed()
+        self.book(status='pending')
+        response = self.mark_completed(appointment)
+        self.assertEqual(response.status_code, 302)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'no_show')
+        self.assertEqual(self.booked(), [1, 1])
+        self.assertIn('fully booked', str(list(get_messages(response.wsgi_request))[0]))
+        dispatch.assert_not_called()
+
+
+class ScanTypeOccupancyTests(TestCase):
+    """Changing how long a scan takes re-spans the bookings still ahead"""
+
+    def test_duration_change_rebuilds_future_occupancy(self):
+        patient = CustomUser.objects.create_user(username='patient', password='secret', role='patient')
+        scan_type = ScanType.objects.create(name='CT', description='', base_price=Decimal('700.00'),
+                                            estimated_duration_minutes=30)
+        appointment = Appointment(patient=patient, scan_type=scan_type, status='confirmed', appointment_time=time(9, 0),
+                                  appointment_date=timezone.localdate() + timedelta(days=1))
+        with transaction.atomic():
+            appointment.save()
+            sync_occupancy(appointment)
+        self.assertEqual(SlotOccupancy.objects.filter(scan_type=scan_type).count(), 2)
+
+        form = ScanTypeForm({'name': 'CT', 'description': 'Longer protocol', 'base_price': '700.00',
+                             'estimated_duration_minutes': 60, 'capacity': 1, 'is_active': True},
+                            instance=ScanType.objects.get(pk=scan_type.pk))
+        form.save()
+        self.assertEqual(list(SlotOccupancy.objects.filter(scan_type=scan_type).values_list('booked', flat=True)),
+                         [1, 1, 1, 1])
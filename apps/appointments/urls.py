@@ -5,6 +5,7 @@ urlpatterns = [
     path('book/', views.book_appointment, name='book_appointment'),
     path('list/', views.appointment_list, name='appointment_list'),
     path('reception/requests/', views.receptionist_queue, name='receptionist_queue'),
+    path('reception/requests/bulk/', views.bulk_manage_appointments, name='bulk_manage_appointments'),
     path('<uuid:pk>/', views.appointment_detail, name='appointment_detail'),
     path('<uuid:pk>/cancel/', views.cancel_appointment, name='cancel_appointment'),
     path('<uuid:pk>/edit/', views.edit_appointment, name='edit_appointment'),
@@ -16,5 +17,6 @@ urlpatterns = [
     path('scans/add/', views.add_scan, name='add_scan'),
     path('scans/<uuid:pk>/delete/', views.delete_scan, name='delete_scan'),
     path('scans/<uuid:pk>/toggle/', views.toggle_scan_active, name='toggle_scan_active'),
+    path('scans/<uuid:pk>/availability/', views.scan_availability, name='scan_availability'),
     path('<uuid:pk>/payment-summary/', views.get_appointment_payment_summary, name='payment_summary'),
 ]
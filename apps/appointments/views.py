@@ -3,12 +3,34 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from datetime import date, timedelta
+import uuid
 from apps.appointments.models import Appointment, ScanType
+from apps.appointments.availability import SlotUnavailable, free_slots, release_slots, sync_occupancy
 from apps.appointments.forms import AppointmentBookingForm, AppointmentEditForm, ReceptionistActionForm
 from apps.appointments.forms import ScanTypeForm
+from apps.appointments.filters import AppointmentFilter
+from apps.appointments.signals import record_status_change
+from apps.notifications.dispatch import dispatch
+from apps.notifications.outbox import enqueue_email
+from apps.notifications.tasks import (
+    send_appointment_cancelled, send_appointment_completed, send_appointment_confirmation,
+    send_bulk_status_notifications, event_version,
+)
 from apps.payments.models import Payment, PaymentShortfall
+from mic_radiology.pagination import KeysetPaginator, cursor_querystring
+
+APPOINTMENTS_PER_PAGE = 25
+
+# Bulk receptionist action -> (new status, statuses it may be applied to)
+BULK_ACTIONS = {
+    'confirm': ('confirmed', ('pending',)),
+    'cancel': ('cancelled', ('pending', 'confirmed')),
+    'complete': ('completed', ('pending', 'confirmed')),
+}
+BULK_ACTION_LIMIT = 500
 
 @login_required(login_url='login')
 def book_appointment(request):
@@ -46,8 +68,6 @@ def book_appointment(request):
             if not appointment.date_of_birth:
                 appointment.date_of_birth = getattr(user, 'date_of_birth', None)
 
-            appointment.save()
-
             # Collect patient personal details to send to reception (use snapshot on appointment)
             full_name = f"{appointment.first_name or ''} {appointment.last_name or ''}".strip() or (request.user.get_full_name() or '')
             email = appointment.contact_email or request.user.email
@@ -89,31 +109,29 @@ def book_appointment(request):
                 f"Appointment ID: {appointment.id}\n"
             )
 
-            # Print to terminal (so developer/receptionist can see submission)
-            print(reception_message)
-
-            # Send to reception email via configured backend (console in dev)
+            # Save the booking, take its scanner slot, queue the reception email and create
+            # the payment in one transaction; the outbox drainer sends the email later
             reception_email = getattr(settings, 'RECEPTION_EMAIL', 'reception@example.com')
             try:
-                send_mail(
-                    subject=f"New Appointment: {full_name} - {appt_date}",
-                    message=reception_message,
-                    from_email=settings.EMAIL_HOST_USER or 'noreply@example.com',
-                    recipient_list=[reception_email],
-                    fail_silently=True,
-                )
-            except Exception:
-                # Avoid breaking booking flow if email fails
-                pass
-            
-            # Create payment record only if scan_type is selected
-            if appointment.scan_type:
-                payment = Payment.objects.create(
-                    appointment=appointment,
-                    service_charge=appointment.scan_type.base_price,
-                    payment_method='pending',
-                    patient_co_payment=appointment.scan_type.base_price
-                )
+                with transaction.atomic():
+                    appointment.save()
+                    sync_occupancy(appointment)
+                    enqueue_email(
+                        subject=f"New Appointment: {full_name} - {appt_date}",
+                        body=reception_message,
+                        recipients=[reception_email],
+                    )
+                    # Create payment record only if scan_type is selected
+                    if appointment.scan_type:
+                        Payment.objects.create(
+                            appointment=appointment,
+                            service_charge=appointment.scan_type.base_price,
+                            payment_method='pending',
+                            patient_co_payment=appointment.scan_type.base_price
+                        )
+            except SlotUnavailable as exc:
+                messages.error(request, str(exc))
+                return render(request, 'appointments/book_appointment.html', {'form': form})
             
             messages.success(request, 'Appointment booked successfully!')
             return redirect('appointment_detail', pk=appointment.id)
@@ -137,15 +155,23 @@ def appointment_list(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    # Filtering
-    status = request.GET.get('status')
-    if status:
-        appointments = appointments.filter(status=status)
+    # Filtering, then a keyset page so each request reads at most one page of rows
+    appointment_filter = AppointmentFilter(
+        request.GET, queryset=appointments.select_related('patient', 'scan_type', 'referring_doctor')
+    )
+    paginator = KeysetPaginator(
+        appointment_filter.qs, ('appointment_date', 'appointment_time', 'id'), per_page=APPOINTMENTS_PER_PAGE
+    )
+    page = paginator.page(request.GET.get('cursor'))
     
     context = {
-        'appointments': appointments,
+        'appointments': page.object_list,
+        'page': page,
+        'filter': appointment_filter,
+        'next_url': cursor_querystring(request.GET, page.next_cursor) if page.has_next() else None,
+        'previous_url': cursor_querystring(request.GET, page.previous_cursor) if page.has_previous() else None,
         'statuses': Appointment.STATUS_CHOICES,
-        'selected_status': status,
+        'selected_status': request.GET.get('status'),
     }
     return render(request, 'appointments/appointment_list.html', context)
 
@@ -194,20 +220,15 @@ def cancel_appointment(request, pk):
             messages.error(request, 'Cannot cancel appointment less than 24 hours before.')
             return redirect('appointment_detail', pk=pk)
         
+        old_status = appointment.status
         appointment.status = 'cancelled'
-        appointment.save()
+        with transaction.atomic():
+            appointment.save()
+            sync_occupancy(appointment, old_status)
 
         # Notify patient and receptionist asynchronously (best-effort)
-        try:
-            from apps.notifications.tasks import send_appointment_cancelled
-            send_appointment_cancelled.delay(str(appointment.id), str(request.user.id))
-        except Exception:
-            # If Celery/task import fails, try to call synchronously
-            try:
-                from apps.notifications.tasks import send_appointment_cancelled
-                send_appointment_cancelled(str(appointment.id), str(request.user.id))
-            except Exception:
-                pass
+        dispatch(send_appointment_cancelled, str(appointment.id), str(request.user.id),
+                 event_version(appointment.status, appointment.updated_at))
 
         messages.success(request, 'Appointment cancelled successfully.')
         # If the cancelling user is a doctor, send them to their Cancelled view
@@ -228,13 +249,24 @@ def edit_appointment(request, pk):
     appointment = get_object_or_404(Appointment, id=pk)
     
     if request.method == 'POST':
+        old_status = appointment.status
+        old_date = appointment.appointment_date
+        old_time = appointment.appointment_time
         form = AppointmentEditForm(request.POST, instance=appointment)
         if form.is_valid():
-            appointment = form.save()
+            appointment = form.save(commit=False)
             if appointment.status == 'confirmed':
                 appointment.confirmed_by = request.user
                 appointment.confirmation_date = timezone.now()
-                appointment.save()
+            # Rescheduling or changing status moves the appointment's slot in the same transaction
+            try:
+                with transaction.atomic():
+                    appointment.save()
+                    sync_occupancy(appointment, old_status, old_date, old_time)
+            except SlotUnavailable as exc:
+                messages.error(request, str(exc))
+                return render(request, 'appointments/edit_appointment.html',
+                             {'form': form, 'appointment': appointment})
             messages.success(request, 'Appointment updated successfully.')
             return redirect('appointment_detail', pk=pk)
     else:
@@ -251,7 +283,7 @@ def receptionist_queue(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
 
-    appointments = Appointment.objects.filter(status='pending')
+    appointments = Appointment.objects.filter(status='pending').select_related('patient', 'scan_type')
     status = request.GET.get('status')
     if status:
         appointments = appointments.filter(status=status)
@@ -259,10 +291,75 @@ def receptionist_queue(request):
     context = {
         'appointments': appointments,
         'statuses': Appointment.STATUS_CHOICES,
+        'bulk_action_limit': BULK_ACTION_LIMIT,
     }
     return render(request, 'appointments/receptionist_queue.html', context)
 
 
+@login_required(login_url='login')
+def bulk_manage_appointments(request):
+    """Receptionist confirms, cancels or completes a selection of appointments at once"""
+    if not request.user.is_receptionist():
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+
+    if request.method != 'POST':
+        return redirect('receptionist_queue')
+
+    action = request.POST.get('action')
+    if action not in BULK_ACTIONS:
+        messages.error(request, 'Unknown action.')
+        return redirect('receptionist_queue')
+
+    ids = []
+    for value in request.POST.getlist('appointment_ids'):
+        try:
+            ids.append(uuid.UUID(value))
+        except ValueError:
+            continue
+    if not ids:
+        messages.error(request, 'Select at least one appointment.')
+        return redirect('receptionist_queue')
+    if len(ids) > BULK_ACTION_LIMIT:
+        messages.error(request, f'Select at most {BULK_ACTION_LIMIT} appointments at a time.')
+        return redirect('receptionist_queue')
+
+    new_status, from_statuses = BULK_ACTIONS[action]
+    now = timezone.now()
+    updates = {'status': new_status, 'receptionist': request.user, 'updated_at': now}
+    if new_status == 'confirmed':
+        updates.update(confirmed_by=request.user, confirmation_date=now)
+
+    # Lock the selection, write it with one UPDATE and free the slots of cancelled bookings
+    with transaction.atomic():
+        selected = list(
+            Appointment.objects.select_for_update()
+            .filter(id__in=ids, status__in=from_statuses)
+            .select_related('scan_type')
+        )
+        Appointment.objects.filter(id__in=[appointment.id for appointment in selected]).update(**updates)
+        if new_status == 'cancelled':
+            release_slots(selected)
+        for old_status in from_statuses:
+            record_status_change(
+                [appointment.id for appointment in selected if appointment.status == old_status],
+                old_status, new_status, changed_by=request.user, source='bulk_action',
+            )
+
+    changed_ids = [str(appointment.id) for appointment in selected]
+    if changed_ids:
+        # One fan-out job for the whole batch instead of a task per appointment
+        dispatch(send_bulk_status_notifications, changed_ids, new_status, str(request.user.id),
+                 event_version(new_status, now))
+
+    skipped = len(ids) - len(changed_ids)
+    message = f'{len(changed_ids)} appointment(s) marked {new_status}.'
+    if skipped:
+        message += f' {skipped} skipped because their status no longer allowed it.'
+    messages.success(request, message)
+    return redirect('receptionist_queue')
+
+
 @login_required(login_url='login')
 def manage_scans(request):
     """Receptionist: list and manage available scan types"""
@@ -318,6 +415,35 @@ def toggle_scan_active(request, pk):
     return redirect('manage_scans')
 
 
+@login_required(login_url='login')
+def scan_availability(request, pk):
+    """Free start times for a scan type over the next N days (AJAX)"""
+    scan_type = get_object_or_404(ScanType, id=pk, is_active=True)
+
+    window = settings.APPOINTMENT_BOOKING_WINDOW_DAYS
+    try:
+        days = min(max(int(request.GET.get('days', 14)), 1), window)
+    except ValueError:
+        days = 14
+
+    today = timezone.localdate()
+    try:
+        start_date = date.fromisoformat(request.GET.get('start', ''))
+    except ValueError:
+        start_date = today
+    start_date = min(max(start_date, today), today + timedelta(days=window))
+
+    slots = free_slots(scan_type, start_date, days)
+    return JsonResponse({
+        'scan_type': str(scan_type.id),
+        'duration_minutes': scan_type.estimated_duration_minutes,
+        'slots': {
+            slot_date.isoformat(): [slot.strftime('%H:%M') for slot in times]
+            for slot_date, times in slots.items()
+        },
+    })
+
+
 @login_required(login_url='login')
 def manage_appointment_by_receptionist(request, pk):
     """Receptionist accepts/declines/writes a note for an appointment"""
@@ -338,46 +464,31 @@ def manage_appointment_by_receptionist(request, pk):
                 appointment.confirmed_by = request.user
                 appointment.confirmation_date = timezone.now()
 
-            appointment.save()
+            try:
+                with transaction.atomic():
+                    appointment.save()
+                    sync_occupancy(appointment, old_status)
+            except SlotUnavailable as exc:
+                messages.error(request, str(exc))
+                return render(request, 'appointments/manage_by_receptionist.html', {
+                    'form': form, 'appointment': appointment
+                })
 
             # If status changed, trigger notifications accordingly
             new_status = appointment.status
             if old_status != new_status:
+                version = event_version(new_status, appointment.updated_at)
                 # Confirmed -> send confirmation notification to patient
                 if new_status == 'confirmed':
-                    try:
-                        from apps.notifications.tasks import send_appointment_confirmation
-                        send_appointment_confirmation.delay(str(appointment.id))
-                    except Exception:
-                        try:
-                            from apps.notifications.tasks import send_appointment_confirmation
-                            send_appointment_confirmation(str(appointment.id))
-                        except Exception:
-                            pass
+                    dispatch(send_appointment_confirmation, str(appointment.id), version)
 
                 # Cancelled -> notify patient, receptionist(s) and referring doctor
                 if new_status == 'cancelled':
-                    try:
-                        from apps.notifications.tasks import send_appointment_cancelled
-                        send_appointment_cancelled.delay(str(appointment.id), str(request.user.id))
-                    except Exception:
-                        try:
-                            from apps.notifications.tasks import send_appointment_cancelled
-                            send_appointment_cancelled(str(appointment.id), str(request.user.id))
-                        except Exception:
-                            pass
+                    dispatch(send_appointment_cancelled, str(appointment.id), str(request.user.id), version)
 
                 # Completed -> notify patient, doctor, reception
                 if new_status == 'completed':
-                    try:
-                        from apps.notifications.tasks import send_appointment_completed
-                        send_appointment_completed.delay(str(appointment.id), str(request.user.id))
-                    except Exception:
-                        try:
-                            from apps.notifications.tasks import send_appointment_completed
-                            send_appointment_completed(str(appointment.id), str(request.user.id))
-                        except Exception:
-                            pass
+                    dispatch(send_appointment_completed, str(appointment.id), str(request.user.id), version)
 
             messages.success(request, 'Appointment updated.')
             return redirect('receptionist_queue')
@@ -399,20 +510,21 @@ def mark_appointment_completed(request, pk):
         return redirect('dashboard')
 
     if request.method == 'POST':
+        old_status = appointment.status
         appointment.status = 'completed'
-        appointment.save()
+        try:
+            with transaction.atomic():
+                appointment.save()
+                sync_occupancy(appointment, old_status)
+        except SlotUnavailable as exc:
+            # e.g. a no-show or cancelled appointment whose slot has since been rebooked
+            messages.error(request, str(exc))
+            return redirect('appointment_detail', pk=pk)
         messages.success(request, 'Appointment marked as completed.')
         # Redirect back to where the user came from if possible
         # Notify patient/doctor/receptionist asynchronously
-        try:
-            from apps.notifications.tasks import send_appointment_completed
-            send_appointment_completed.delay(str(appointment.id), str(request.user.id))
-        except Exception:
-            try:
-                from apps.notifications.tasks import send_appointment_completed
-                send_appointment_completed(str(appointment.id), str(request.user.id))
-            except Exception:
-                pass
+        dispatch(send_appointment_completed, str(appointment.id), str(request.user.id),
+                 event_version(appointment.status, appointment.updated_at))
 
         ref = request.META.get('HTTP_REFERER')
         if ref:
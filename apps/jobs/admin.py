@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+from apps.jobs.models import JobLock, JobRun
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'started_at', 'duration_ms', 'rows', 'host')
+    list_filter = ('status', 'name', 'started_at')
+    search_fields = ('name', 'error')
+    readonly_fields = ('name', 'status', 'host', 'started_at', 'finished_at', 'duration_ms', 'rows', 'result', 'error')
+
+
+@admin.register(JobLock)
+class JobLockAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'acquired_at', 'locked_until')
+    actions = ['release']
+
+    @admin.action(description='Release selected leases')
+    def release(self, request, queryset):
+        updated = queryset.update(owner='', locked_until=timezone.now())
+        self.message_user(request, f'{updated} lease(s) released.')
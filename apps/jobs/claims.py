@@ -0,0 +1,51 @@
+"""
+Work claiming for batch jobs: workers lease chunks of rows so they can process a sweep in parallel
+
+A claimable model has two fields: claim_token (CharField) and claimed_until
+(nullable DateTimeField). A row is free when claimed_until is null or past.
+"""
+import uuid
+from contextlib import nullcontext
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+def free(now):
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now)
+
+
+def claim(queryset, batch_size, lease):
+    """
+    Lease up to batch_size free rows of queryset to a new token.
+
+    Candidates are read with SELECT ... FOR UPDATE SKIP LOCKED where the
+    database supports it, so workers never queue on each other's rows.
+    The lease itself is a conditional UPDATE that only takes rows that are
+    still free and still match queryset, which is what makes it safe on
+    SQLite too: two workers can read the same candidates, but each row is
+    written by exactly one, and a row that stopped being due in between
+    (e.g. reminded by another path) is not taken.
+    Returns (token, ids); ids is empty when there is nothing left to claim.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    model = queryset.model
+    candidates = queryset.filter(free(now)).order_by('pk')
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    # Without SKIP LOCKED there is nothing to gain from a read-then-write transaction
+    # (on SQLite it only invites lock upgrade failures between workers)
+    with transaction.atomic() if skip_locked else nullcontext():
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+        ids = list(candidates.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return token, []
+        # Through the caller's queryset, so its due conditions are checked again as the lease is written
+        queryset.filter(free(now), pk__in=ids).update(claim_token=token, claimed_until=now + lease)
+    return token, list(model.objects.filter(claim_token=token).values_list('pk', flat=True))
+
+
+def release(model, token, **changes):
+    """Clear a token's claim, applying changes to its rows in the same UPDATE. Returns the row count."""
+    return model.objects.filter(claim_token=token).update(claim_token='', claimed_until=None, **changes)
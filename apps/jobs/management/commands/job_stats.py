@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+from apps.jobs.models import JobRun
+
+class Command(BaseCommand):
+    help = 'Summarise recent periodic job runs: count, failures, durations and rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='How far back to look')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        stats = (
+            JobRun.objects.filter(started_at__gte=since)
+            .values('name')
+            .annotate(
+                runs=Count('id'),
+                failed=Count('id', filter=Q(status='failed')),
+                running=Count('id', filter=Q(status='running')),
+                avg_ms=Avg('duration_ms'),
+                max_ms=Max('duration_ms'),
+                avg_rows=Avg('rows'),
+                last=Max('started_at'),
+            )
+            .order_by('name')
+        )
+        self.stdout.write(f"{'job':<60} {'runs':>5} {'fail':>5} {'avg ms':>8} {'max ms':>8} {'avg rows':>9}  last run")
+        for row in stats:
+            self.stdout.write(
+                f"{row['name']:<60} {row['runs']:>5} {row['failed']:>5} "
+                f"{row['avg_ms'] or 0:>8.0f} {row['max_ms'] or 0:>8} {row['avg_rows'] or 0:>9.1f}  "
+                f"{row['last']:%Y-%m-%d %H:%M}{' (running)' if row['running'] else ''}"
+            )
@@ -0,0 +1,51 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+import uuid
+
+class JobLock(models.Model):
+    """
+    Lease on a periodic job; whoever holds an unexpired lease runs it
+    """
+    name = models.CharField(max_length=200, primary_key=True)
+    owner = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField()
+    acquired_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class JobRun(models.Model):
+    """
+    One execution of a periodic job, with its duration and row count
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    host = models.CharField(max_length=200, blank=True)
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    duration_ms = models.PositiveIntegerField(blank=True, null=True)
+    
+    rows = models.PositiveIntegerField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['name', 'started_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} at {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
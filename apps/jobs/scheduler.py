@@ -0,0 +1,158 @@
+"""
+Periodic jobs: one lease per job in the database, and a JobRun row per execution
+"""
+import functools
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.jobs.models import JobLock, JobRun
+
+logger = logging.getLogger(__name__)
+
+
+def _host():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def acquire(name, lease):
+    """
+    Take the lease on a job for the given timedelta.
+
+    The lease is taken with one conditional UPDATE, so of several beat or
+    worker replicas racing for it exactly one wins. Returns the owner token,
+    or None when someone else holds an unexpired lease.
+    """
+    now = timezone.now()
+    JobLock.objects.get_or_create(name=name, defaults={'locked_until': now})
+    token = uuid.uuid4().hex
+    taken = JobLock.objects.filter(name=name, locked_until__lte=now).update(
+        owner=token, locked_until=now + lease, acquired_at=now
+    )
+    return token if taken else None
+
+
+def release(name, token, min_interval=timedelta(0)):
+    """
+    Give the lease back. It stays held until min_interval after it was taken,
+    so a duplicate message for the same tick finds it locked.
+    """
+    now = timezone.now()
+    lock = JobLock.objects.filter(name=name, owner=token).first()
+    if lock is None:
+        return
+    JobLock.objects.filter(name=name, owner=token).update(
+        owner='', locked_until=max(now, lock.acquired_at + min_interval)
+    )
+
+
+def row_count(result):
+    """
+    Rows a job reports touching: an int, a dict's 'rows' entry, or else the
+    sum of the ints in a dict or sequence
+    """
+    if isinstance(result, dict) and 'rows' in result:
+        result = result['rows']
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        result = result.values()
+    if isinstance(result, (list, tuple, type({}.values()))):
+        numbers = [value for value in result if isinstance(value, int) and not isinstance(value, bool)]
+        return sum(numbers) if numbers else None
+    return None
+
+
+def _run(job_name, func, args, kwargs):
+    """Call func, recording a JobRun with its outcome, duration and rows"""
+    run = JobRun.objects.create(name=job_name, host=_host())
+    started = time.monotonic()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        _finish(run, started, status='failed', error=traceback.format_exc())
+        raise
+    _finish(run, started, status='succeeded', result=result)
+    return result
+
+
+def periodic_job(lease, min_interval=timedelta(0), name=None):
+    """
+    Run the decorated function under the job's lease and record a JobRun.
+
+    A call that cannot take the lease returns None without running. lease
+    should comfortably exceed the job's longest run: a worker that dies
+    mid-run holds the job until the lease expires, then the next tick
+    takes over. Put it under @shared_task so the task name is unchanged.
+    """
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = acquire(job_name, lease)
+            if token is None:
+                logger.info('Skipping %s: another run holds the lease', job_name)
+                return None
+            try:
+                return _run(job_name, func, args, kwargs)
+            finally:
+                release(job_name, token, min_interval)
+
+        wrapper.job_name = job_name
+        return wrapper
+    return decorator
+
+
+def tracked_job(name=None):
+    """
+    Record a JobRun for every call, without a lease.
+
+    For the workers a periodic job fans out to: several run at once by
+    design, each claiming its own rows, and each gets its own run row.
+    """
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return _run(job_name, func, args, kwargs)
+
+        wrapper.job_name = job_name
+        return wrapper
+    return decorator
+
+
+def _finish(run, started, status, result=None, error=''):
+    duration_ms = int((time.monotonic() - started) * 1000)
+    rows = row_count(result)
+    if isinstance(result, tuple):
+        result = list(result)
+    JobRun.objects.filter(id=run.id).update(
+        status=status,
+        finished_at=timezone.now(),
+        duration_ms=duration_ms,
+        rows=rows,
+        result=result if isinstance(result, (dict, list, int, float, str)) else None,
+        error=error,
+    )
+    logger.info('%s %s in %d ms (rows=%s)', run.name, status, duration_ms, rows)
+
+
+def prune_runs(days, batch_size=1000):
+    """Delete JobRun rows older than days, in primary-key chunks. Returns the count."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(JobRun.objects.filter(started_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += JobRun.objects.filter(id__in=ids).delete()[0]
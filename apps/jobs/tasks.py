@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+
+from apps.jobs.scheduler import periodic_job, prune_runs
+
+
+@shared_task
+@periodic_job(lease=timedelta(hours=1), min_interval=timedelta(hours=1))
+def prune_job_runs():
+    """Delete job run history past JOB_RUN_RETENTION_DAYS"""
+    return prune_runs(settings.JOB_RUN_RETENTION_DAYS)
@@ -1,16 +1,68 @@
 from django.contrib import admin
-from apps.notifications.models import Notification, NotificationTemplate
+from django.db.models import Count
+from django.utils import timezone
+from apps.notifications.models import (
+    Notification, NotificationPreference, NotificationTemplate, OutboxMessage, PendingDigestEntry
+)
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient', 'notification_type', 'channel', 'status', 'created_at')
-    list_filter = ('status', 'notification_type', 'channel', 'created_at')
+    list_display = ('recipient', 'notification_type', 'channel', 'status', 'attempts', 'error_class', 'created_at')
+    list_filter = ('status', 'error_class', 'notification_type', 'channel', 'created_at')
     search_fields = ('recipient__email', 'subject')
-    readonly_fields = ('created_at', 'sent_at', 'delivered_at')
+    readonly_fields = ('created_at', 'sent_at', 'delivered_at', 'attempts', 'next_attempt_at', 'error_class', 'error_message')
+    change_list_template = 'admin/notifications/notification/change_list.html'
+    actions = ['retry_now']
+
+    def changelist_view(self, request, extra_context=None):
+        # Failed and dead-lettered rows by error class, read from the status index
+        extra_context = extra_context or {}
+        extra_context['delivery_errors'] = (
+            Notification.objects.filter(status__in=('failed', 'dead'))
+            .values('status', 'error_class')
+            .annotate(count=Count('id'))
+            .order_by('status', '-count')
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+    @admin.action(description='Retry delivery of selected notifications now')
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(status__in=('failed', 'dead')).update(
+            status='failed', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} notification(s) queued for another delivery attempt.')
 
 
 @admin.register(NotificationTemplate)
 class NotificationTemplateAdmin(admin.ModelAdmin):
-    list_display = ('name', 'notification_type', 'is_active', 'created_at')
+    list_display = ('name', 'notification_type', 'is_active', 'updated_at')
     list_filter = ('is_active',)
     search_fields = ('name',)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'channel', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'channel', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected messages now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} message(s) queued for delivery.')
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'digest_enabled', 'digest_interval_minutes', 'updated_at')
+    list_filter = ('digest_enabled',)
+    search_fields = ('user__email', 'user__username')
+
+
+@admin.register(PendingDigestEntry)
+class PendingDigestEntryAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'notification_type', 'line', 'created_at')
+    list_filter = ('notification_type',)
+    search_fields = ('recipient__email', 'line')
@@ -0,0 +1,72 @@
+"""
+Per-user unread notification counters kept in the cache
+
+The counters only work in a cache every process shares (Redis in
+production). With a process-local cache each web and worker process would
+keep its own count, so reads go straight to the database instead.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from apps.notifications.models import Notification
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _shared():
+    """False when the default cache lives inside this process"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _count(user_id):
+    return Notification.objects.filter(recipient_id=user_id, status__in=Notification.UNREAD_STATUSES).count()
+
+
+def unread_count(user_id):
+    """Cached unread count, recomputed from the database only on a miss"""
+    if not _shared():
+        return _count(user_id)
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = _count(user_id)
+        # add() rather than set(): an increment that raced us keeps its value
+        cache.add(_key(user_id), count, settings.UNREAD_COUNT_CACHE_SECONDS)
+    return count
+
+
+def incr_unread(user_id, delta=1):
+    """
+    Bump a cached counter once the current transaction commits.
+
+    A missing key is left alone for the next read to rebuild from the database.
+    """
+    if not _shared():
+        return
+
+    def bump():
+        try:
+            cache.incr(_key(user_id), delta)
+        except ValueError:
+            pass
+    transaction.on_commit(bump)
+
+
+def record_created(notifications):
+    """Count freshly inserted unread notifications (bulk_create sends no post_save)"""
+    per_user = Counter(
+        notification.recipient_id for notification in notifications
+        if notification.status in Notification.UNREAD_STATUSES
+    )
+    for user_id, delta in per_user.items():
+        incr_unread(user_id, delta)
+
+
+def invalidate_unread(user_id):
+    cache.delete(_key(user_id))
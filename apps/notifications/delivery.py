@@ -0,0 +1,149 @@
+"""
+Notification delivery state machine: attempt, record the outcome, retry with backoff, dead-letter
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+from apps.notifications.outbox import retry_delay
+
+EMAIL_CHANNELS = ('email', 'both')
+
+
+def from_email():
+    return settings.EMAIL_HOST_USER or 'noreply@micradiology.com'
+
+
+def email_address(notification):
+    """Where to email a notification; rows loaded back for a retry recompute it"""
+    address = getattr(notification, 'email_to', None)
+    if address:
+        return address
+    appointment = notification.appointment
+    if appointment and appointment.patient_id == notification.recipient_id and appointment.contact_email:
+        return appointment.contact_email
+    return notification.recipient.email
+
+
+def send_emails(notifications):
+    """
+    Email each notification on an email channel over one connection.
+
+    Returns {notification id: exception or None}. Notifications that have
+    no email channel or address are in-app only and count as sent.
+    """
+    outcomes = {}
+    sender = from_email()
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        for notification in notifications:
+            outcomes[notification.id] = exc if notification.channel in EMAIL_CHANNELS and email_address(notification) else None
+        return outcomes
+    try:
+        for notification in notifications:
+            address = email_address(notification) if notification.channel in EMAIL_CHANNELS else None
+            if not address:
+                outcomes[notification.id] = None
+                continue
+            try:
+                EmailMessage(notification.subject, notification.message, sender, [address],
+                             connection=connection).send(fail_silently=False)
+            except Exception as exc:
+                outcomes[notification.id] = exc
+            else:
+                outcomes[notification.id] = None
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return outcomes
+
+
+def record_outcomes(notifications, outcomes):
+    """
+    Move attempted notifications to sent, failed (with a backoff) or dead.
+
+    Successes are one UPDATE; failures are updated one by one, which is rare.
+    Only rows still in a retryable state are touched, so a notification the
+    user read meanwhile stays read. Returns (sent, failed, dead).
+    """
+    now = timezone.now()
+    sent_ids = [notification.id for notification in notifications if outcomes.get(notification.id) is None]
+    if sent_ids:
+        Notification.objects.filter(id__in=sent_ids, status__in=Notification.RETRYABLE_STATUSES).update(
+            status='sent', sent_at=now, attempts=F('attempts') + 1,
+            next_attempt_at=None, error_class='', error_message='',
+        )
+
+    failed = dead = 0
+    for notification in notifications:
+        exc = outcomes.get(notification.id)
+        if exc is None:
+            continue
+        attempts = notification.attempts + 1
+        give_up = attempts >= settings.NOTIFICATION_MAX_ATTEMPTS
+        Notification.objects.filter(id=notification.id, status__in=Notification.RETRYABLE_STATUSES).update(
+            status='dead' if give_up else 'failed',
+            attempts=attempts,
+            next_attempt_at=None if give_up else now + retry_delay(attempts),
+            error_class=exc.__class__.__name__[:100],
+            error_message=str(exc),
+        )
+        if give_up:
+            dead += 1
+        else:
+            failed += 1
+    return len(sent_ids), failed, dead
+
+
+def deliver(notifications):
+    """Attempt the email leg of freshly written notifications and record the result"""
+    if not notifications:
+        return 0, 0, 0
+    return record_outcomes(notifications, send_emails(notifications))
+
+
+def _claim(batch_size):
+    """Lease a batch of due notifications so concurrent sweeps skip them"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status__in=Notification.RETRYABLE_STATUSES, next_attempt_at__lte=now)
+            .select_related('recipient', 'appointment')
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            Notification.objects.filter(id__in=[notification.id for notification in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_PENDING_GRACE_SECONDS)
+            )
+    return batch
+
+
+def retry_due(batch_size=None, max_batches=None):
+    """
+    Retry failed notifications whose backoff has elapsed, and pending ones
+    whose first attempt never happened (e.g. the worker died after the insert).
+
+    The sweep reads the (status, next_attempt_at) index only, so its cost does
+    not grow with the number of historical rows. Returns (sent, failed, dead).
+    """
+    batch_size = batch_size or settings.NOTIFICATION_RETRY_BATCH_SIZE
+    totals = [0, 0, 0]
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = _claim(batch_size)
+        if not batch:
+            break
+        batches += 1
+        for index, count in enumerate(deliver(batch)):
+            totals[index] += count
+    return tuple(totals)
@@ -0,0 +1,102 @@
+"""
+Digest mode: staff updates are parked in PendingDigestEntry and sent as one summary per window
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.notifications.models import NotificationPreference, PendingDigestEntry
+
+
+def _line(notification):
+    return ' '.join(notification.message.split())[:300]
+
+
+def divert(notifications):
+    """
+    Park digestible notifications for users in digest mode.
+
+    Returns the notifications that should still be sent individually. Costs
+    one preference query, plus one bulk insert when anything was parked;
+    like Notification rows, an event is parked once per recipient.
+    """
+    candidates = {notification.recipient_id for notification in notifications if getattr(notification, 'digestible', False)}
+    if not candidates:
+        return notifications
+    digest_users = set(
+        NotificationPreference.objects.filter(user_id__in=candidates, digest_enabled=True).values_list('user_id', flat=True)
+    )
+    if not digest_users:
+        return notifications
+
+    parked, remaining = [], []
+    for notification in notifications:
+        if getattr(notification, 'digestible', False) and notification.recipient_id in digest_users:
+            parked.append(PendingDigestEntry(
+                recipient_id=notification.recipient_id,
+                notification_type=notification.notification_type,
+                appointment=notification.appointment,
+                line=_line(notification),
+                idempotency_key=notification.idempotency_key,
+            ))
+        else:
+            remaining.append(notification)
+    # Entries whose key is already parked (a repeated event) are skipped by the database
+    PendingDigestEntry.objects.bulk_create(parked, batch_size=500, ignore_conflicts=True)
+    return remaining
+
+
+def due_recipients(now=None):
+    """Users whose oldest parked entry has waited a full digest window"""
+    now = now or timezone.now()
+    intervals = dict(
+        NotificationPreference.objects.filter(digest_enabled=True).values_list('user_id', 'digest_interval_minutes')
+    )
+    oldest = PendingDigestEntry.objects.values_list('recipient_id').annotate(oldest=Min('created_at'))
+    # Users who switched digests off since get whatever is still parked straight away
+    return [
+        user_id for user_id, first in oldest
+        if first <= now - timedelta(minutes=intervals.get(user_id, 0))
+    ]
+
+
+def flush(now=None):
+    """
+    Send one summary notification per due recipient and clear their entries.
+
+    Entries are locked with SKIP LOCKED, so overlapping runs never send the
+    same entry twice. Returns the number of digests sent.
+    """
+    from apps.notifications import fanout, templating
+
+    due = due_recipients(now)
+    if not due:
+        return 0
+    with transaction.atomic():
+        entries = list(
+            PendingDigestEntry.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(recipient_id__in=due)
+            .select_related('recipient')
+            .order_by('recipient_id', 'created_at')
+        )
+        if not entries:
+            return 0
+        groups = [(recipient_id, list(group)) for recipient_id, group in groupby(entries, key=lambda entry: entry.recipient_id)]
+        rendered = templating.render_many('digest', [
+            {
+                'first_name': group[0].recipient.first_name,
+                'count': len(group),
+                'entries': group,
+            }
+            for _, group in groups
+        ])
+        notifications = fanout.write([
+            fanout.build(group[0].recipient, 'digest', message.subject, message.body, event=f'digest:{group[0].id}')
+            for (_, group), message in zip(groups, rendered)
+        ])
+        PendingDigestEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+    fanout.deliver(notifications)
+    return len(notifications)
@@ -0,0 +1,100 @@
+"""
+Task dispatch with a broker circuit breaker and a bounded in-process fallback pool
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_lock = threading.Lock()
+_metrics = {'queued': 0, 'fallback': 0, 'dropped': 0, 'broker_errors': 0, 'breaker_trips': 0}
+_breaker = {'failures': 0, 'open_until': 0.0}
+_pool = None
+_slots = None
+
+
+def _incr(name):
+    with _lock:
+        _metrics[name] += 1
+
+
+def dispatch_metrics():
+    """Counters for this process, plus the current breaker state"""
+    with _lock:
+        snapshot = dict(_metrics)
+        open_until = _breaker['open_until']
+    snapshot['breaker_open'] = time.monotonic() < open_until
+    return snapshot
+
+
+def _breaker_open():
+    with _lock:
+        return time.monotonic() < _breaker['open_until']
+
+
+def _record_success():
+    with _lock:
+        _breaker['failures'] = 0
+        _breaker['open_until'] = 0.0
+
+
+def _record_failure():
+    with _lock:
+        _metrics['broker_errors'] += 1
+        _breaker['failures'] += 1
+        # A failed probe after the cool-down re-opens the breaker straight away
+        if _breaker['failures'] >= settings.DISPATCH_BREAKER_THRESHOLD or _breaker['open_until']:
+            _breaker['failures'] = 0
+            _breaker['open_until'] = time.monotonic() + settings.DISPATCH_BREAKER_COOLDOWN_SECONDS
+            _metrics['breaker_trips'] += 1
+
+
+def _get_pool():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            workers = settings.DISPATCH_FALLBACK_WORKERS
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dispatch-fallback')
+            _slots = threading.BoundedSemaphore(workers + settings.DISPATCH_FALLBACK_QUEUE_SIZE)
+        return _pool
+
+
+def _run_locally(task, args, kwargs):
+    try:
+        task.apply(args=args, kwargs=kwargs)
+    finally:
+        close_old_connections()
+        _slots.release()
+
+
+def _fallback(task, args, kwargs):
+    pool = _get_pool()
+    if not _slots.acquire(blocking=False):
+        _incr('dropped')
+        return 'dropped'
+    _incr('fallback')
+    pool.submit(_run_locally, task, args, kwargs)
+    return 'fallback'
+
+
+def dispatch(task, *args, **kwargs):
+    """
+    Queue a Celery task without ever running it on the request thread.
+
+    The task goes to the broker unless the circuit breaker is open. If
+    publishing fails, or the breaker is open, it runs on a small background
+    thread pool instead. When that pool's queue is full the dispatch is
+    dropped and counted. Returns 'queued', 'fallback' or 'dropped'.
+    """
+    if not _breaker_open():
+        try:
+            task.apply_async(args=args, kwargs=kwargs, retry=False)
+        except Exception:
+            _record_failure()
+        else:
+            _record_success()
+            _incr('queued')
+            return 'queued'
+    return _fallback(task, args, kwargs)
@@ -0,0 +1,127 @@
+"""
+Notification fan-out: one bulk insert, one mail connection and one SMS batch per event
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.notifications import delivery, sms
+from apps.notifications.counters import record_created
+from apps.notifications.digest import divert
+from apps.notifications.idempotency import notification_key
+from apps.notifications.models import Notification
+from apps.users.models import CustomUser
+
+# Columns needed to address and greet a recipient
+RECIPIENT_FIELDS = ('id', 'email', 'phone_number', 'first_name', 'last_name', 'role')
+
+SMS_CHANNELS = ('sms', 'both')
+
+
+def receptionists():
+    """All receptionists, resolved in one query"""
+    return list(CustomUser.objects.filter(role='receptionist').only(*RECIPIENT_FIELDS))
+
+
+def build(recipient, notification_type, subject, message, appointment=None, channel='email', email=None,
+          sms_text='', phone=None, digestible=False, event=None):
+    """
+    Return an unsaved Notification for one recipient.
+
+    email and phone override where the message is sent (e.g. the contact
+    details given on a booking); by default the recipient's own are used.
+    sms_text is the short text sent on SMS channels. digestible messages
+    are held for the recipient's digest when they have digest mode on.
+    event identifies what happened (e.g. 'cancelled:<updated_at>'); the same
+    event is only ever written once per recipient.
+    """
+    notification = Notification(
+        recipient=recipient,
+        notification_type=notification_type,
+        channel=channel,
+        subject=subject[:200],
+        message=message,
+        appointment=appointment,
+        status='pending',
+        next_attempt_at=timezone.now() + timedelta(seconds=settings.NOTIFICATION_PENDING_GRACE_SECONDS),
+        idempotency_key=(
+            notification_key(notification_type, appointment.id if appointment else None, recipient.id, event)
+            if event else None
+        ),
+    )
+    notification.email_to = email or recipient.email
+    notification.sms_to = phone or recipient.phone_number
+    notification.sms_text = sms_text
+    notification.digestible = digestible
+    return notification
+
+
+def write(notifications):
+    """
+    Insert the notifications with bulk_create and return the ones that were new.
+
+    Rows whose idempotency key already exists are skipped by the database;
+    primary keys are generated here, so one query tells which rows landed.
+    """
+    if not notifications:
+        return []
+    Notification.objects.bulk_create(notifications, batch_size=500, ignore_conflicts=True)
+    if any(notification.idempotency_key for notification in notifications):
+        inserted = set(Notification.objects.filter(
+            id__in=[notification.id for notification in notifications]
+        ).values_list('id', flat=True))
+        notifications = [notification for notification in notifications if notification.id in inserted]
+    record_created(notifications)
+    return notifications
+
+
+def send_sms(notifications):
+    """
+    Text every notification on an SMS channel as one rate-limited batch.
+
+    Messages the provider rejects go to the outbox, which retries them with
+    backoff. Returns the number sent now.
+    """
+    from apps.notifications.outbox import enqueue_sms
+
+    texts = [
+        sms.SmsMessage(notification.sms_to, notification.sms_text)
+        for notification in notifications
+        if notification.channel in SMS_CHANNELS and getattr(notification, 'sms_to', None)
+        and getattr(notification, 'sms_text', '')
+    ]
+    if not texts:
+        return 0
+    try:
+        sent = sms.get_connection(fail_silently=True).send_messages(texts)
+    except Exception as exc:
+        sent = 0
+        for text in texts:
+            text.status, text.error = 'failed', str(exc)
+    for text in texts:
+        # 'skipped' (SMS disabled) is final; only provider failures are retried
+        if text.status == 'failed':
+            enqueue_sms(text.body, [text.to], text.from_number)
+    return sent
+
+
+def deliver(notifications):
+    """
+    Send already-written notifications on their email and SMS channels.
+
+    The email leg drives each row's delivery status (see delivery); the SMS
+    leg is best-effort with its own retries through the outbox.
+    """
+    delivery.deliver(notifications)
+    send_sms(notifications)
+
+
+def fan_out(notifications):
+    """Write a batch of built notifications and deliver them, holding back digest-mode ones"""
+    notifications = divert([notification for notification in notifications if notification is not None])
+    if not notifications:
+        return []
+    notifications = write(notifications)
+    deliver(notifications)
+    return notifications
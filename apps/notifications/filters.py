@@ -0,0 +1,15 @@
+import django_filters
+from django import forms
+from apps.notifications.models import Notification
+
+class NotificationFilter(django_filters.FilterSet):
+    """Notification type filter for the inbox"""
+
+    notification_type = django_filters.ChoiceFilter(
+        choices=Notification.NOTIFICATION_TYPE_CHOICES, empty_label='All types',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+
+    class Meta:
+        model = Notification
+        fields = ('notification_type',)
@@ -0,0 +1,23 @@
+from django import forms
+from apps.notifications.models import NotificationPreference
+
+class NotificationPreferenceForm(forms.ModelForm):
+    """Form for a user's notification delivery preferences"""
+
+    class Meta:
+        model = NotificationPreference
+        fields = ('digest_enabled', 'digest_interval_minutes')
+        labels = {
+            'digest_enabled': 'Send me a summary instead of one email per update',
+            'digest_interval_minutes': 'Summary interval (minutes)',
+        }
+        widgets = {
+            'digest_enabled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'digest_interval_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': 5, 'max': 1440}),
+        }
+
+    def clean_digest_interval_minutes(self):
+        minutes = self.cleaned_data['digest_interval_minutes']
+        if not 5 <= minutes <= 1440:
+            raise forms.ValidationError('Choose between 5 minutes and 24 hours.')
+        return minutes
@@ -0,0 +1,38 @@
+"""
+Idempotency for notification tasks: per-event keys on rows, per-message markers in the cache
+"""
+import hashlib
+
+from celery import Task
+from django.conf import settings
+from django.core.cache import cache
+
+
+def notification_key(notification_type, appointment_id, recipient_id, event):
+    """Stable key for one event's notification to one recipient"""
+    raw = f"{notification_type}|{appointment_id or '-'}|{recipient_id}|{event}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _done_key(task_id):
+    return f'notifications:task-done:{task_id}'
+
+
+class IdempotentTask(Task):
+    """
+    Skip a task message that has already run to completion.
+
+    The task id is remembered for NOTIFICATION_TASK_DEDUP_SECONDS after a
+    successful run, so a broker redelivery returns straight away. Anything
+    that still gets through (a crash before the marker, a second dispatch
+    of the same event) is caught by Notification.idempotency_key.
+    """
+
+    def __call__(self, *args, **kwargs):
+        task_id = self.request.id
+        if task_id and cache.get(_done_key(task_id)):
+            return None
+        result = super().__call__(*args, **kwargs)
+        if task_id:
+            cache.set(_done_key(task_id), 1, settings.NOTIFICATION_TASK_DEDUP_SECONDS)
+        return result
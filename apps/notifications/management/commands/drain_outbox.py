@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.notifications.outbox import drain
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox messages (use --loop on deployments without a Celery broker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep draining until interrupted')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds to sleep between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
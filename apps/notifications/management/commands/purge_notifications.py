@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.notifications.retention import purge, retention_days
+
+class Command(BaseCommand):
+    help = 'Delete notifications past their retention period, in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows deleted per chunk')
+        parser.add_argument('--pause', type=float, default=None, help='Seconds to sleep between chunks')
+        parser.add_argument('--archive', action='store_true', default=None,
+                            help='Write purged rows to a gzipped JSONL file under MEDIA_ROOT first')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        counts = purge(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            archive=options['archive'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for notification_type, count in counts.items():
+            if count:
+                self.stdout.write(f"{verb} {count} {notification_type} (older than {retention_days(notification_type)} days)")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(counts.values())} notification(s)"))
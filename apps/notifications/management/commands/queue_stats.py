@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from mic_radiology.celery import app
+
+
+def _published_at(raw):
+    try:
+        return float(json.loads(raw)['headers']['published_at'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Report depth and oldest-message age for each Celery queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def _redis_stats(self, channel, queue):
+        # Kombu keeps one Redis list per priority step; new messages are pushed
+        # on the left, so the oldest one sits at the right end of each list.
+        client = channel.client
+        depth, oldest = 0, None
+        for priority in channel.priority_steps:
+            key = channel._q_for_pri(queue, priority)
+            depth += client.llen(key)
+            published = _published_at(client.lindex(key, -1))
+            if published and (oldest is None or published < oldest):
+                oldest = published
+        return depth, oldest
+
+    def _amqp_stats(self, connection, queue):
+        # AMQP exposes depth only; reading the head would take it off the queue.
+        # A passive declare of a queue nobody has used yet fails and closes its
+        # channel, hence one channel per queue.
+        channel = connection.channel()
+        try:
+            return channel.queue_declare(queue=queue, passive=True).message_count, None
+        except connection.channel_errors:
+            return 0, None
+        finally:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def handle(self, *args, **options):
+        queues = [queue.name for queue in settings.CELERY_TASK_QUEUES]
+        now = time.time()
+        stats = []
+        try:
+            with app.connection_for_read() as connection:
+                connection.ensure_connection(max_retries=1)
+                channel = connection.default_channel
+                redis = connection.transport.driver_type == 'redis'
+                for queue in queues:
+                    depth, oldest = self._redis_stats(channel, queue) if redis else self._amqp_stats(connection, queue)
+                    stats.append({
+                        'queue': queue,
+                        'depth': depth,
+                        'oldest_age_seconds': round(now - oldest, 1) if oldest else None,
+                    })
+        except Exception as exc:
+            raise CommandError(f"Could not read queues from the broker: {exc}")
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+        self.stdout.write(f"{'Queue':<16}{'Depth':>10}{'Oldest (s)':>14}")
+        for row in stats:
+            age = '-' if row['oldest_age_seconds'] is None else f"{row['oldest_age_seconds']:.1f}"
+            self.stdout.write(f"{row['queue']:<16}{row['depth']:>10}{age:>14}")
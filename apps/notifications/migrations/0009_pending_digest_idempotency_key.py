@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_notification_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingdigestentry',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from apps.appointments.models import Appointment
 from apps.users.models import CustomUser
 import uuid
@@ -14,6 +15,7 @@ class Notification(models.Model):
         ('report_ready', 'Report Ready'),
         ('appointment_cancelled', 'Appointment Cancelled'),
         ('payment_shortfall', 'Payment Shortfall'),
+        ('digest', 'Digest'),
     ]
     
     CHANNEL_CHOICES = [
@@ -26,9 +28,17 @@ class Notification(models.Model):
         ('pending', 'Pending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
+        ('dead', 'Dead letter'),
         ('delivered', 'Delivered'),
     ]
     
+    # Delivery lifecycle: pending -> sent, or pending -> failed (retried with
+    # backoff) -> sent | dead. 'delivered' means the user has read it in the app.
+    RETRYABLE_STATUSES = ('pending', 'failed')
+    
+    # Statuses shown as unread in the bell counter
+    UNREAD_STATUSES = ('pending', 'sent', 'failed', 'dead')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='notifications')
     
@@ -47,6 +57,13 @@ class Notification(models.Model):
     
     external_id = models.CharField(max_length=100, blank=True)  # From SMS/Email provider
     error_message = models.TextField(blank=True)
+    error_class = models.CharField(max_length=100, blank=True)
+    
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    
+    # Hash of (type, appointment, recipient, event); a repeated event cannot insert a second row
+    idempotency_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -55,6 +72,8 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient', 'status']),
             models.Index(fields=['notification_type']),
+            models.Index(fields=['recipient', 'created_at'], name='notif_recipient_created_idx'),
+            models.Index(fields=['status', 'next_attempt_at'], name='notif_status_next_attempt_idx'),
         ]
     
     def __str__(self):
@@ -82,3 +101,85 @@ class NotificationTemplate(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class OutboxMessage(models.Model):
+    """
+    Outgoing message written in the caller's transaction and delivered by the outbox drainer
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped (SMS disabled)'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default='email')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    recipients = models.JSONField(default=list)
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_channel_display()} to {', '.join(self.recipients)} ({self.status})"  # type: ignore
+
+
+class NotificationPreference(models.Model):
+    """
+    Per-user delivery preferences
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='notification_preference')
+    
+    digest_enabled = models.BooleanField(default=False, help_text="Bundle staff updates into one summary email")
+    digest_interval_minutes = models.PositiveIntegerField(default=15)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Preferences for {self.user.get_full_name()}"  # type: ignore
+
+
+class PendingDigestEntry(models.Model):
+    """
+    One event waiting to go out in a recipient's next digest
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='pending_digest_entries')
+    notification_type = models.CharField(max_length=30)
+    appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='+')
+    line = models.CharField(max_length=300)
+    # The parked notification's idempotency key; a repeated event is parked only once
+    idempotency_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return self.line
@@ -0,0 +1,144 @@
+"""
+Transactional outbox: messages are stored with the business change and sent by a drainer
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notifications import sms
+from apps.notifications.models import OutboxMessage
+
+
+def retry_delay(attempts, base_seconds=60, max_seconds=3600):
+    """Exponential backoff with full jitter for the given attempt number"""
+    ceiling = min(max_seconds, base_seconds * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def _kick_drainer():
+    from apps.notifications.dispatch import dispatch
+    from apps.notifications.tasks import drain_outbox
+    dispatch(drain_outbox)
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """
+    Store an email in the outbox as part of the current transaction.
+
+    Nothing touches the network here; the drainer is nudged once the
+    transaction commits, and a rollback discards the message with the data.
+    """
+    message = OutboxMessage.objects.create(
+        channel='email',
+        recipients=list(recipients),
+        from_email=from_email or settings.EMAIL_HOST_USER or 'noreply@micradiology.com',
+        subject=subject[:200],
+        body=body,
+    )
+    transaction.on_commit(_kick_drainer)
+    return message
+
+
+def enqueue_sms(body, recipients, from_number=None):
+    """Store an SMS in the outbox as part of the current transaction (also the SMS retry queue)"""
+    message = OutboxMessage.objects.create(
+        channel='sms',
+        recipients=list(recipients),
+        from_email=from_number or settings.TWILIO_PHONE_NUMBER,
+        body=body,
+    )
+    transaction.on_commit(_kick_drainer)
+    return message
+
+
+def _send_sms(message, connection):
+    """Send an outbox SMS; returns 'skipped' when SMS is disabled, raises when the provider failed"""
+    texts = [sms.SmsMessage(to, message.body, message.from_email) for to in message.recipients if to]
+    connection.send_messages(texts)
+    failed = [text for text in texts if text.status == 'failed']
+    if failed:
+        raise RuntimeError('; '.join(f"{text.to}: {text.error}" for text in failed))
+    if texts and all(text.status == 'skipped' for text in texts):
+        return 'skipped'
+    return 'sent'
+
+
+def _claim(batch_size):
+    """Lease a batch of due messages so concurrent drainers skip them"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            OutboxMessage.objects.filter(id__in=[message.id for message in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            )
+    return batch
+
+
+def drain(batch_size=None, max_batches=None):
+    """
+    Deliver due outbox messages in batches over one mail (and SMS) connection per batch.
+
+    Each message is marked sent as soon as the server accepts it, so a crash
+    re-sends at most the message in flight. Failures are retried with backoff
+    until OUTBOX_MAX_ATTEMPTS, then left as failed. Returns (sent, failed).
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    sent = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = _claim(batch_size)
+        if not batch:
+            break
+        batches += 1
+
+        connection = get_connection()
+        sms_connection = sms.get_connection(fail_silently=True)
+        try:
+            connection.open()
+        except Exception:
+            pass
+        try:
+            for message in batch:
+                outcome = 'sent'
+                try:
+                    if message.channel == 'sms':
+                        outcome = _send_sms(message, sms_connection)
+                    else:
+                        email = EmailMessage(message.subject, message.body, message.from_email,
+                                             message.recipients, connection=connection)
+                        email.send(fail_silently=False)
+                except Exception as exc:
+                    attempts = message.attempts + 1
+                    give_up = attempts >= settings.OUTBOX_MAX_ATTEMPTS
+                    OutboxMessage.objects.filter(id=message.id).update(
+                        attempts=attempts,
+                        status='failed' if give_up else 'pending',
+                        next_attempt_at=timezone.now() + retry_delay(attempts),
+                        last_error=f"{exc.__class__.__name__}: {exc}",
+                    )
+                    failed += 1
+                else:
+                    if outcome == 'skipped':
+                        # SMS is disabled: final, not a failure to retry
+                        OutboxMessage.objects.filter(id=message.id).update(
+                            status='skipped', attempts=message.attempts + 1, last_error='SMS disabled'
+                        )
+                        continue
+                    OutboxMessage.objects.filter(id=message.id).update(
+                        status='sent', attempts=message.attempts + 1, sent_at=timezone.now(), last_error=''
+                    )
+                    sent += 1
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    return sent, failed
@@ -0,0 +1,89 @@
+"""
+Notification retention: archive and delete old rows in small primary-key chunks
+"""
+import gzip
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from apps.notifications.counters import invalidate_unread
+from apps.notifications.models import Notification
+
+ARCHIVE_DIR = 'notification_archive'
+
+
+def retention_days(notification_type):
+    policy = settings.NOTIFICATION_RETENTION_DAYS
+    return policy.get(notification_type, policy['default'])
+
+
+def expired(notification_type, now=None):
+    """Rows of a type past retention. Rows still awaiting delivery are kept."""
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days(notification_type))
+    return Notification.objects.filter(notification_type=notification_type, created_at__lt=cutoff).exclude(
+        status__in=Notification.RETRYABLE_STATUSES
+    )
+
+
+def archive_path(now=None):
+    stamp = (now or timezone.now()).strftime('%Y%m%d-%H%M%S')
+    return Path(settings.MEDIA_ROOT) / ARCHIVE_DIR / f'notifications-{stamp}.jsonl.gz'
+
+
+def purge(batch_size=None, pause=None, archive=None, dry_run=False, now=None):
+    """
+    Delete notifications past their type's retention.
+
+    Each chunk is at most batch_size rows selected by primary key and deleted
+    in its own short statement, with a pause between chunks, so the purge
+    never holds long locks. Pending and failed rows are never purged. With
+    archive, each chunk is first appended to a gzipped JSONL file under
+    MEDIA_ROOT. Returns {notification_type: count}.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+    pause = settings.NOTIFICATION_PURGE_PAUSE_SECONDS if pause is None else pause
+    archive = settings.NOTIFICATION_PURGE_ARCHIVE if archive is None else archive
+    now = now or timezone.now()
+
+    counts = {}
+    archive_file = None
+    try:
+        for notification_type, _ in Notification.NOTIFICATION_TYPE_CHOICES:
+            queryset = expired(notification_type, now)
+            if dry_run:
+                counts[notification_type] = queryset.count()
+                continue
+
+            deleted = 0
+            while True:
+                ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                chunk = Notification.objects.filter(id__in=ids)
+                if archive:
+                    if archive_file is None:
+                        path = archive_path(now)
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        archive_file = gzip.open(path, 'at', encoding='utf-8')
+                    for row in chunk.values().iterator():
+                        archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive_file.flush()
+                unread_recipients = set(
+                    chunk.filter(status__in=Notification.UNREAD_STATUSES).values_list('recipient_id', flat=True)
+                )
+                deleted += chunk.delete()[0]
+                for user_id in unread_recipients:
+                    invalidate_unread(user_id)
+                if len(ids) < batch_size:
+                    break
+                time.sleep(pause)
+            counts[notification_type] = deleted
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+    return counts
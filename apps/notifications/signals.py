@@ -0,0 +1,14 @@
+"""
+Notification model signal handlers
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.notifications.counters import incr_unread
+from apps.notifications.models import Notification
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and instance.status in Notification.UNREAD_STATUSES:
+        incr_unread(instance.recipient_id)
@@ -0,0 +1,32 @@
+"""
+Pluggable SMS delivery, modelled on django.core.mail backends
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class SmsMessage:
+    """One text message. Backends set status ('sent'/'failed'/'skipped'), error and external_id."""
+
+    def __init__(self, to, body, from_number=None):
+        self.to = to
+        self.body = body
+        self.from_number = from_number or settings.TWILIO_PHONE_NUMBER
+        self.status = None
+        self.error = ''
+        self.external_id = ''
+
+    def __repr__(self):
+        return f"<SmsMessage to={self.to} status={self.status}>"
+
+
+def get_connection(backend=None, fail_silently=False, **kwargs):
+    """Load an SMS backend (SMS_BACKEND by default) and return an instance of it"""
+    klass = import_string(backend or settings.SMS_BACKEND)
+    return klass(fail_silently=fail_silently, **kwargs)
+
+
+def send_sms(to, body, from_number=None, fail_silently=False, connection=None):
+    """Send one SMS; returns 1 if the provider accepted it"""
+    connection = connection or get_connection(fail_silently=fail_silently)
+    return connection.send_messages([SmsMessage(to, body, from_number)])
@@ -0,0 +1,62 @@
+"""Base class for SMS backends"""
+from django.conf import settings
+
+from apps.notifications.sms.ratelimit import shared_bucket
+
+
+class BaseSmsBackend:
+    """
+    Subclasses implement send_one(); send_messages() handles batching,
+    rate limiting and recording each message's outcome.
+    """
+
+    def __init__(self, fail_silently=False, rate=None, burst=None, **kwargs):
+        self.fail_silently = fail_silently
+        self.bucket = shared_bucket(
+            self.__class__.__module__,
+            rate or settings.SMS_RATE_PER_SECOND,
+            burst or settings.SMS_BURST,
+        )
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def send_one(self, message):
+        """Submit one message and return the provider's id for it"""
+        raise NotImplementedError('subclasses of BaseSmsBackend must override send_one()')
+
+    def send_messages(self, messages):
+        """
+        Send messages in batches of SMS_BATCH_SIZE over one open connection,
+        taking a rate-limit token per message. Returns the number sent.
+        """
+        messages = [message for message in messages if message.to]
+        if not messages:
+            return 0
+        sent = 0
+        batch_size = settings.SMS_BATCH_SIZE
+        with self:
+            for start in range(0, len(messages), batch_size):
+                for message in messages[start:start + batch_size]:
+                    self.bucket.acquire()
+                    try:
+                        message.external_id = self.send_one(message) or ''
+                    except Exception as exc:
+                        message.status = 'failed'
+                        message.error = f"{exc.__class__.__name__}: {exc}"
+                        if not self.fail_silently:
+                            raise
+                    else:
+                        message.status = 'sent'
+                        sent += 1
+        return sent
@@ -0,0 +1,22 @@
+"""SMS backend that writes messages to stdout"""
+import sys
+import threading
+import uuid
+
+from apps.notifications.sms.backends.base import BaseSmsBackend
+
+
+class SmsBackend(BaseSmsBackend):
+    def __init__(self, *args, stream=None, **kwargs):
+        self.stream = stream or sys.stdout
+        self._lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def write_message(self, message):
+        self.stream.write(f"SMS from {message.from_number or '-'} to {message.to}\n{message.body}\n{'-' * 79}\n")
+
+    def send_one(self, message):
+        with self._lock:
+            self.write_message(message)
+            self.stream.flush()
+        return uuid.uuid4().hex
@@ -0,0 +1,18 @@
+"""SMS backend used when no provider is configured: messages are dropped, and only their count is logged"""
+import logging
+
+from apps.notifications.sms.backends.base import BaseSmsBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SmsBackend(BaseSmsBackend):
+    def send_messages(self, messages):
+        messages = [message for message in messages if message.to]
+        for message in messages:
+            message.status = 'skipped'
+            message.error = 'SMS disabled'
+        if messages:
+            # No numbers or bodies: this is the production fallback
+            logger.warning('SMS disabled: %d message(s) not sent; set TWILIO_* or SMS_BACKEND', len(messages))
+        return 0
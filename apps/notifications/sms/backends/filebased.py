@@ -0,0 +1,31 @@
+"""SMS backend that appends messages to a file, one file per connection"""
+import datetime
+import os
+
+from django.conf import settings
+
+from apps.notifications.sms.backends.console import SmsBackend as ConsoleSmsBackend
+
+
+class SmsBackend(ConsoleSmsBackend):
+    def __init__(self, *args, file_path=None, **kwargs):
+        self.file_path = os.path.abspath(file_path or settings.SMS_FILE_PATH)
+        os.makedirs(self.file_path, exist_ok=True)
+        self._fname = None
+        super().__init__(*args, stream=None, **kwargs)
+        self.stream = None
+
+    def _get_filename(self):
+        if self._fname is None:
+            timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+            self._fname = os.path.join(self.file_path, f'{timestamp}-{abs(id(self))}.log')
+        return self._fname
+
+    def open(self):
+        if self.stream is None:
+            self.stream = open(self._get_filename(), 'a')
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
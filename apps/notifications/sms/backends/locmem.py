@@ -0,0 +1,16 @@
+"""SMS backend that keeps messages in apps.notifications.sms.outbox, for tests and load runs"""
+import uuid
+
+from apps.notifications import sms
+from apps.notifications.sms.backends.base import BaseSmsBackend
+
+
+class SmsBackend(BaseSmsBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not hasattr(sms, 'outbox'):
+            sms.outbox = []
+
+    def send_one(self, message):
+        sms.outbox.append(message)
+        return uuid.uuid4().hex
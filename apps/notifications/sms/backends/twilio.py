@@ -0,0 +1,32 @@
+"""SMS backend for the Twilio REST API (requires the twilio package)"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from apps.notifications.sms.backends.base import BaseSmsBackend
+
+
+class SmsBackend(BaseSmsBackend):
+    def __init__(self, *args, account_sid=None, auth_token=None, **kwargs):
+        self.account_sid = account_sid or settings.TWILIO_ACCOUNT_SID
+        self.auth_token = auth_token or settings.TWILIO_AUTH_TOKEN
+        self.client = None
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self.client is not None:
+            return
+        try:
+            from twilio.rest import Client
+        except ImportError:
+            raise ImproperlyConfigured('The twilio package is required for the Twilio SMS backend.')
+        if not self.account_sid or not self.auth_token:
+            raise ImproperlyConfigured('TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN must be set.')
+        # One client (and its HTTP session) is reused for the whole batch
+        self.client = Client(self.account_sid, self.auth_token)
+
+    def close(self):
+        self.client = None
+
+    def send_one(self, message):
+        result = self.client.messages.create(to=message.to, from_=message.from_number, body=message.body)
+        return result.sid
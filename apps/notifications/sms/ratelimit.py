@@ -0,0 +1,59 @@
+"""
+Token-bucket rate limiting for outbound providers
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allow `rate` operations per second on average, with bursts up to `capacity`.
+
+    Thread-safe. The limit is per process: with several workers, divide the
+    provider's limit between them.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; return the seconds to wait otherwise (0 on success)"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; False if that would exceed timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name, rate, capacity):
+    """One bucket per name for the whole process, so every connection shares the limit"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None or (bucket.rate, bucket.capacity) != (float(rate), float(capacity)):
+            bucket = _buckets[name] = TokenBucket(rate, capacity)
+        return bucket
@@ -1,381 +1,299 @@
+from datetime import timedelta
+
 from celery import shared_task
-from apps.notifications.models import Notification
+from apps.jobs.scheduler import periodic_job
+from apps.notifications import fanout, templating
+from apps.notifications.idempotency import IdempotentTask
 from apps.reports.models import Report
 from apps.payments.models import Payment
-from django.core.mail import send_mail
-from decouple import config
 
-@shared_task
-def send_appointment_confirmation(appointment_id):
-    """Send appointment confirmation SMS and email"""
+
+def _appointments():
     from apps.appointments.models import Appointment
-    try:
-        appointment = Appointment.objects.get(id=appointment_id)
-        
-        subject = f"Appointment Confirmation - {appointment.scan_type.name}"
-        message = f"""
-Dear {appointment.patient.first_name},
-
-Your appointment has been scheduled for:
-Date: {appointment.appointment_date}
-Time: {appointment.appointment_time}
-Service: {appointment.scan_type.name}
-
-Please arrive 15 minutes early.
-
-Best regards,
-MIC Radiology Management System
-        """
-        
-        # Create notification records
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_confirmation',
-            channel='both',
-            subject=subject,
-            message=message,
-            appointment=appointment,
-            status='sent'
-        )
-        
-        # Send email
-        try:
-            from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-            if isinstance(from_email, str):
-                send_mail(
-                    subject,
-                    message,
-                    from_email,
-                    [appointment.patient.email],
-                    fail_silently=True,
-                )
-        except:
-            pass
-        
-        # Send SMS (integrate with Twilio)
-        # send_sms_notification(appointment.patient.phone_number, message[:160])
-        
-    except Appointment.DoesNotExist:
-        pass
+    return Appointment.objects.select_related('patient', 'scan_type', 'referring_doctor', 'receptionist')
 
 
-@shared_task
-def send_appointment_reminder(appointment_id):
-    """Send appointment reminder"""
-    from apps.appointments.models import Appointment
-    try:
-        appointment = Appointment.objects.get(id=appointment_id)
-        
-        if appointment.reminder_sent:
-            return
-        
-        subject = "Appointment Reminder"
-        message = f"""
-Dear {appointment.patient.first_name},
-
-This is a reminder about your upcoming appointment:
-Date: {appointment.appointment_date}
-Time: {appointment.appointment_time}
-Service: {appointment.scan_type.name}
-
-Please call +1-234-567 to reschedule if needed.
-
-Best regards,
-MIC Radiology Management System
-        """
-        
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_reminder',
-            channel='both',
-            subject=subject,
-            message=message,
-            appointment=appointment,
-            status='sent'
-        )
-        
-        appointment.reminder_sent = True
-        appointment.save()
-        
-    except Appointment.DoesNotExist:
-        pass
+def _actor(user_id):
+    """The user who made a change, or None"""
+    from apps.users.models import CustomUser
+    if not user_id:
+        return None
+    return CustomUser.objects.filter(id=user_id).only(*fanout.RECIPIENT_FIELDS).first()
+
+
+def _actor_name(user):
+    return user.get_full_name() if user else 'System'
+
+
+def _scan_name(appointment):
+    return appointment.scan_type.name if appointment.scan_type else (appointment.appointment_description or 'Appointment')
+
+
+def _patient_email(appointment):
+    return appointment.contact_email or appointment.patient.email
+
+
+def _patient_phone(appointment):
+    return appointment.contact_phone or appointment.patient.phone_number
+
+
+def _reception_recipients(appointment, all_receptionists):
+    """The assigned receptionist, or every receptionist (resolved once by the caller)"""
+    if appointment.receptionist:
+        return [appointment.receptionist]
+    return all_receptionists
+
+
+def appointment_context(appointment, actor=None):
+    """Template variables shared by the appointment notifications"""
+    return {
+        'first_name': appointment.patient.first_name,
+        'patient_name': appointment.patient.get_full_name(),
+        'date': appointment.appointment_date,
+        'time': appointment.appointment_time,
+        'scan_name': _scan_name(appointment),
+        'actor_name': _actor_name(actor),
+    }
+
+
+def event_version(status, updated_at):
+    """
+    Version of an appointment change, captured where its notification task is
+    queued and passed to the task, so a redelivery maps to the same event
+    """
+    return f"{status}:{updated_at.isoformat()}"
+
+
+def _is_stale(appointment, version):
+    """True when the appointment has moved on from the status the task was queued for"""
+    return bool(version) and version.split(':', 1)[0] != appointment.status
+
+
+def _event(kind, appointment, version=None):
+    # Messages queued without a version fall back to the row as it is now
+    return f"{kind}:{version or event_version(appointment.status, appointment.updated_at)}"
+
+
+def _build(renderer, name, recipient, notification_type, context, appointment, channel='email', email=None,
+           phone=None, digestible=False, event=None):
+    rendered = renderer.render(name, context)
+    return fanout.build(recipient, notification_type, rendered.subject, rendered.body,
+                        appointment=appointment, channel=channel, email=email,
+                        sms_text=rendered.sms.strip(), phone=phone, digestible=digestible, event=event)
+
+
+def confirmation_notifications(appointment, renderer, version=None):
+    return [_build(renderer, 'appointment_confirmation', appointment.patient, 'appointment_confirmation',
+                   appointment_context(appointment), appointment, channel='both', email=_patient_email(appointment),
+                   phone=_patient_phone(appointment), event=_event('confirmed', appointment, version))]
+
+
+def cancelled_notifications(appointment, cancelled_by, all_receptionists, renderer, version=None):
+    context = appointment_context(appointment, cancelled_by)
+    event = _event('cancelled', appointment, version)
+    notifications = [_build(renderer, 'appointment_cancelled', appointment.patient, 'appointment_cancelled',
+                            context, appointment, channel='both', email=_patient_email(appointment),
+                            phone=_patient_phone(appointment), event=event)]
+    notifications += [
+        _build(renderer, 'appointment_cancelled_reception', receptionist, 'appointment_cancelled', context, appointment,
+               digestible=True, event=event)
+        for receptionist in _reception_recipients(appointment, all_receptionists)
+    ]
+    if appointment.referring_doctor:
+        notifications.append(_build(renderer, 'appointment_cancelled_staff', appointment.referring_doctor,
+                                    'appointment_cancelled', context, appointment, digestible=True, event=event))
+    return notifications
+
+
+def completed_notifications(appointment, completed_by, all_receptionists, renderer, version=None):
+    context = appointment_context(appointment, completed_by)
+    event = _event('completed', appointment, version)
+    notifications = [_build(renderer, 'appointment_completed', appointment.patient, 'appointment_confirmation',
+                            context, appointment, channel='both', email=_patient_email(appointment),
+                            phone=_patient_phone(appointment), event=event)]
+    if appointment.referring_doctor:
+        notifications.append(_build(renderer, 'appointment_completed_staff', appointment.referring_doctor,
+                                    'report_ready', context, appointment, digestible=True, event=event))
+    notifications += [
+        _build(renderer, 'appointment_completed_reception', receptionist, 'report_ready', context, appointment,
+               digestible=True, event=event)
+        for receptionist in _reception_recipients(appointment, all_receptionists)
+    ]
+    return notifications
+
+
+def _needs_all_receptionists(appointments):
+    return any(not appointment.receptionist_id for appointment in appointments)
+
+
+@shared_task(base=IdempotentTask)
+def send_appointment_confirmation(appointment_id, version=None):
+    """Send appointment confirmation SMS and email"""
+    appointment = _appointments().filter(id=appointment_id).first()
+    if appointment and not _is_stale(appointment, version):
+        fanout.fan_out(confirmation_notifications(appointment, templating.Renderer(), version))
 
 
 @shared_task
-def send_report_ready_notification(report_id):
-    """Notify patient that report is ready"""
-    try:
-        report = Report.objects.get(id=report_id)
-        appointment = report.appointment
-        
-        subject = "Your Radiology Report is Ready"
-        message = f"""
-Dear {appointment.patient.first_name},
-
-Your radiology report for {appointment.scan_type.name} is now ready for download.
-
-Log in to your account to view and download your report.
-
-Best regards,
-MIC Radiology Management System
-        """
-        
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='report_ready',
-            channel='both',
-            subject=subject,
-            message=message,
-            appointment=appointment,
-            status='sent'
-        )
-        
-        # Also notify referring doctor if available
-        if appointment.referring_doctor:
-            Notification.objects.create(
-                recipient=appointment.referring_doctor,
-                notification_type='report_ready',
-                channel='email',
-                subject=subject,
-                message=message,
-                appointment=appointment,
-                status='sent'
-            )
-        
-    except Report.DoesNotExist:
-        pass
+def drain_outbox():
+    """Deliver pending outbox messages"""
+    from apps.notifications.outbox import drain
+    sent, failed = drain()
+    return {'sent': sent, 'failed': failed}
 
 
 @shared_task
-def send_appointment_completed(appointment_id, completed_by_id=None):
-    """Notify patient, referring doctor and receptionist that an appointment was completed."""
-    from apps.appointments.models import Appointment
-    from apps.users.models import CustomUser
-    from django.core.mail import send_mail
-    from decouple import config
-    try:
-        appointment = Appointment.objects.get(id=appointment_id)
-
-        completed_by = None
-        if completed_by_id:
-            try:
-                completed_by = CustomUser.objects.get(id=completed_by_id)
-            except Exception:
-                completed_by = None
-
-        subject = f"Appointment Completed - {appointment.scan_type.name if appointment.scan_type else 'Appointment'}"
-        patient_message = f"""
-Dear {appointment.patient.first_name},
-
-Your appointment scheduled for {appointment.appointment_date} at {appointment.appointment_time} has been marked as completed.
-Marked completed by: {completed_by.get_full_name() if completed_by else 'System'}.
-
-You can log in to view any reports or follow-up instructions.
-
-Best regards,
-MIC Radiology Management System
-        """
-
-        # Create notification record for patient
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_confirmation',
-            channel='both',
-            subject=subject,
-            message=patient_message,
-            appointment=appointment,
-            status='sent'
-        )
+@periodic_job(lease=timedelta(minutes=5), min_interval=timedelta(seconds=50))
+def sweep_outbox():
+    """Scheduled drain that catches messages whose commit-time nudge was lost"""
+    return drain_outbox()
+
 
-        # Send email to patient (best-effort)
-        try:
-            from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-            recipient_email = appointment.contact_email or getattr(appointment.patient, 'email', None)
-            if recipient_email:
-                send_mail(subject, patient_message, from_email, [recipient_email], fail_silently=True)
-        except Exception:
-            pass
-
-        # Notify referring doctor if present
-        if appointment.referring_doctor:
-            doc_msg = f"Appointment for {appointment.patient.get_full_name()} on {appointment.appointment_date} at {appointment.appointment_time} was marked completed by {completed_by.get_full_name() if completed_by else 'System'}."
-            Notification.objects.create(
-                recipient=appointment.referring_doctor,
-                notification_type='report_ready',
-                channel='email',
-                subject=subject,
-                message=doc_msg,
-                appointment=appointment,
-                status='sent'
-            )
-            try:
-                from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-                if getattr(appointment.referring_doctor, 'email', None):
-                    send_mail(subject, doc_msg, from_email, [appointment.referring_doctor.email], fail_silently=True)
-            except Exception:
-                pass
-
-        # Notify receptionist(s)
-        if appointment.receptionist:
-            receptionists = [appointment.receptionist]
-        else:
-            receptionists = CustomUser.objects.filter(role='receptionist')
-
-        reception_subject = f"[Reception] {subject}"
-        reception_message = f"Appointment for {appointment.patient.get_full_name()} on {appointment.appointment_date} at {appointment.appointment_time} was marked completed by {completed_by.get_full_name() if completed_by else 'System'}."
-
-        for r in receptionists:
-            Notification.objects.create(
-                recipient=r,
-                notification_type='report_ready',
-                channel='email',
-                subject=reception_subject,
-                message=reception_message,
-                appointment=appointment,
-                status='sent'
-            )
-            try:
-                from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-                if getattr(r, 'email', None):
-                    send_mail(reception_subject, reception_message, from_email, [r.email], fail_silently=True)
-            except Exception:
-                pass
-
-    except Appointment.DoesNotExist:
-        pass
+@shared_task
+@periodic_job(lease=timedelta(minutes=5), min_interval=timedelta(seconds=50))
+def retry_notifications():
+    """Retry failed or stalled notification deliveries that are due"""
+    from apps.notifications.delivery import retry_due
+    sent, failed, dead = retry_due()
+    return {'sent': sent, 'failed': failed, 'dead': dead}
 
 
 @shared_task
-def send_payment_confirmation(payment_id):  # type: ignore
-    """Send payment confirmation"""
-    try:
-        payment = Payment.objects.get(id=payment_id)
-        appointment = payment.appointment
-        
-        subject = "Payment Received"
-        payment_status = payment.get_status_display()  # type: ignore
-        message = f"""
-Dear {appointment.patient.first_name},
-
-We have received your payment of {payment.service_charge}.
-
-Transaction ID: {payment.transaction_id or payment.id}
-Status: {payment_status}
-
-Your appointment is confirmed for {appointment.appointment_date} at {appointment.appointment_time}.
-
-Best regards,
-MIC Radiology Management System
-        """
-        
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_confirmation',
-            channel='both',
-            subject=subject,
-            message=message,
-            appointment=appointment,
-            status='sent'
-        )
-        
-    except Payment.DoesNotExist:
-        pass
+@periodic_job(lease=timedelta(minutes=10), min_interval=timedelta(minutes=4))
+def flush_digests():
+    """Send staff digests whose window has elapsed"""
+    from apps.notifications.digest import flush
+    return flush()
 
 
 @shared_task
-def send_appointment_cancelled(appointment_id, cancelled_by_id=None):
-    """Notify patient and receptionist that an appointment was cancelled."""
+@periodic_job(lease=timedelta(hours=3), min_interval=timedelta(hours=1))
+def purge_notifications():
+    """Delete (and optionally archive) notifications past their retention"""
+    from apps.notifications.retention import purge
+    return purge()
+
+
+def create_reminder_notifications(appointments):
+    """Render and insert reminder notifications for already-claimed appointments in one query."""
+    rendered = templating.render_many(
+        'appointment_reminder', [appointment_context(appointment) for appointment in appointments]
+    )
+    notifications = [
+        fanout.build(appointment.patient, 'appointment_reminder', message.subject, message.body,
+                     appointment=appointment, channel='both', email=_patient_email(appointment),
+                     sms_text=message.sms.strip(), phone=_patient_phone(appointment),
+                     event=f"reminder:{appointment.appointment_date.isoformat()}")
+        for appointment, message in zip(appointments, rendered)
+    ]
+    return fanout.write(notifications)
+
+
+@shared_task(base=IdempotentTask)
+def send_appointment_reminder(appointment_id):
+    """Send appointment reminder"""
     from apps.appointments.models import Appointment
-    from apps.users.models import CustomUser
-    from django.core.mail import send_mail
-    from decouple import config
-    try:
-        appointment = Appointment.objects.get(id=appointment_id)
-
-        cancelled_by = None
-        if cancelled_by_id:
-            try:
-                cancelled_by = CustomUser.objects.get(id=cancelled_by_id)
-            except Exception:
-                cancelled_by = None
-
-        subject = f"Appointment Cancelled - {appointment.scan_type.name if appointment.scan_type else 'Appointment'}"
-        patient_message = f"""
-Dear {appointment.patient.first_name},
-
-Your appointment scheduled for {appointment.appointment_date} at {appointment.appointment_time} has been cancelled.
-Cancelled by: {cancelled_by.get_full_name() if cancelled_by else 'System'}.
-
-If you have questions, please contact reception.
-
-Best regards,
-MIC Radiology Management System
-        """
-
-        # Create notification record for patient
-        Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_cancelled',
-            channel='both',
-            subject=subject,
-            message=patient_message,
-            appointment=appointment,
-            status='sent'
+    from django.utils import timezone
+    from django.db import transaction
+
+    with transaction.atomic():
+        # Claim the reminder first so concurrent runs cannot both send it
+        claimed = Appointment.objects.filter(id=appointment_id, reminder_sent=False).update(
+            reminder_sent=True, reminder_sent_at=timezone.now()
         )
+        if not claimed:
+            return
+        appointment = Appointment.objects.select_related('patient', 'scan_type').get(id=appointment_id)
+        notifications = create_reminder_notifications([appointment])
+    fanout.deliver(notifications)
+
 
-        # Send email to patient (best-effort)
-        try:
-            from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-            recipient_email = appointment.contact_email or getattr(appointment.patient, 'email', None)
-            if recipient_email:
-                send_mail(subject, patient_message, from_email, [recipient_email], fail_silently=True)
-        except Exception:
-            pass
-
-        # Notify receptionist(s)
-        if appointment.receptionist:
-            receptionists = [appointment.receptionist]
-        else:
-            receptionists = CustomUser.objects.filter(role='receptionist')
-
-        reception_subject = f"[Reception] {subject}"
-        reception_message = f"Appointment for {appointment.patient.get_full_name()} on {appointment.appointment_date} at {appointment.appointment_time} was cancelled by {cancelled_by.get_full_name() if cancelled_by else 'System'}."
-
-        for r in receptionists:
-            Notification.objects.create(
-                recipient=r,
-                notification_type='appointment_cancelled',
-                channel='email',
-                subject=reception_subject,
-                message=reception_message,
-                appointment=appointment,
-                status='sent'
-            )
-            try:
-                from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-                if getattr(r, 'email', None):
-                    send_mail(reception_subject, reception_message, from_email, [r.email], fail_silently=True)
-            except Exception:
-                pass
-
-        # Notify referring doctor if present
-        if appointment.referring_doctor:
-            doc_msg = f"Appointment for {appointment.patient.get_full_name()} on {appointment.appointment_date} at {appointment.appointment_time} was cancelled by {cancelled_by.get_full_name() if cancelled_by else 'System'}."
-            Notification.objects.create(
-                recipient=appointment.referring_doctor,
-                notification_type='appointment_cancelled',
-                channel='email',
-                subject=subject,
-                message=doc_msg,
-                appointment=appointment,
-                status='sent'
-            )
-            try:
-                from_email = config('EMAIL_HOST_USER', default='noreply@micradiology.com')
-                if getattr(appointment.referring_doctor, 'email', None):
-                    send_mail(subject, doc_msg, from_email, [appointment.referring_doctor.email], fail_silently=True)
-            except Exception:
-                pass
-
-    except Appointment.DoesNotExist:
-        pass
+@shared_task(base=IdempotentTask)
+def send_report_ready_notification(report_id):
+    """Notify patient that report is ready"""
+    report = Report.objects.select_related(
+        'appointment__patient', 'appointment__scan_type', 'appointment__referring_doctor'
+    ).filter(id=report_id).first()
+    if not report:
+        return
+    appointment = report.appointment
+
+    renderer = templating.Renderer()
+    context = appointment_context(appointment)
+    event = f"report:{report.id}"
+    notifications = [_build(renderer, 'report_ready', appointment.patient, 'report_ready', context, appointment,
+                            channel='both', email=_patient_email(appointment),
+                            phone=_patient_phone(appointment), event=event)]
+    # Also notify referring doctor if available
+    if appointment.referring_doctor:
+        notifications.append(_build(renderer, 'report_ready', appointment.referring_doctor, 'report_ready',
+                                    context, appointment, event=event))
+    fanout.fan_out(notifications)
+
+
+@shared_task(base=IdempotentTask)
+def send_appointment_completed(appointment_id, completed_by_id=None, version=None):
+    """Notify patient, referring doctor and receptionist that an appointment was completed."""
+    appointment = _appointments().filter(id=appointment_id).first()
+    if not appointment or _is_stale(appointment, version):
+        return
+    all_receptionists = fanout.receptionists() if not appointment.receptionist_id else []
+    fanout.fan_out(completed_notifications(appointment, _actor(completed_by_id), all_receptionists,
+                                           templating.Renderer(), version))
+
+
+@shared_task(base=IdempotentTask)
+def send_bulk_status_notifications(appointment_ids, status, changed_by_id=None, version=None):
+    """
+    Send the status-change notifications for a batch of appointments in one job.
+
+    Appointments, the acting user, the receptionist list and each template
+    are loaded once, and every message in the batch shares one insert and
+    one connection. Appointments no longer in status are skipped.
+    """
+    appointments = list(_appointments().filter(id__in=appointment_ids, status=status))
+    if not appointments:
+        return 0
+    changed_by = _actor(changed_by_id)
+    all_receptionists = fanout.receptionists() if _needs_all_receptionists(appointments) else []
+
+    renderer = templating.Renderer()
+    notifications = []
+    for appointment in appointments:
+        if status == 'confirmed':
+            notifications += confirmation_notifications(appointment, renderer, version)
+        elif status == 'cancelled':
+            notifications += cancelled_notifications(appointment, changed_by, all_receptionists, renderer, version)
+        elif status == 'completed':
+            notifications += completed_notifications(appointment, changed_by, all_receptionists, renderer, version)
+    return len(fanout.fan_out(notifications))
+
+
+@shared_task(base=IdempotentTask)
+def send_payment_confirmation(payment_id):  # type: ignore
+    """Send payment confirmation"""
+    payment = Payment.objects.select_related('appointment__patient').filter(id=payment_id).first()
+    if not payment:
+        return
+    appointment = payment.appointment
+
+    context = dict(
+        appointment_context(appointment),
+        amount=payment.service_charge,
+        transaction_id=payment.transaction_id or payment.id,
+        payment_status=payment.get_status_display(),  # type: ignore
+    )
+    fanout.fan_out([_build(templating.Renderer(), 'payment_received', appointment.patient, 'appointment_confirmation',
+                           context, appointment, channel='both', email=_patient_email(appointment),
+                           phone=_patient_phone(appointment), event=f"payment:{payment.id}:{payment.status}")])
+
+
+@shared_task(base=IdempotentTask)
+def send_appointment_cancelled(appointment_id, cancelled_by_id=None, version=None):
+    """Notify patient and receptionist that an appointment was cancelled."""
+    appointment = _appointments().filter(id=appointment_id).first()
+    if not appointment or _is_stale(appointment, version):
+        return
+    all_receptionists = fanout.receptionists() if not appointment.receptionist_id else []
+    fanout.fan_out(cancelled_notifications(appointment, _actor(cancelled_by_id), all_receptionists,
+                                           templating.Renderer(), version))
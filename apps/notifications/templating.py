@@ -0,0 +1,203 @@
+"""
+Notification rendering through NotificationTemplate, with compiled templates cached per process
+"""
+import threading
+from collections import namedtuple
+
+from django.template import Context, Engine
+
+from apps.notifications.models import NotificationTemplate
+
+Rendered = namedtuple('Rendered', ['subject', 'body', 'sms'])
+
+# Plain-text messages: no HTML escaping
+engine = Engine(autoescape=False)
+
+_SIGNATURE = """
+Best regards,
+MIC Radiology Management System
+"""
+
+_STAFF_CANCELLED = "Appointment for {{ patient_name }} on {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }} was cancelled by {{ actor_name }}."
+_STAFF_COMPLETED = "Appointment for {{ patient_name }} on {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }} was marked completed by {{ actor_name }}."
+
+# Used when no active NotificationTemplate row exists, or a row leaves a part blank.
+# (subject, email body, sms)
+DEFAULTS = {
+    'appointment_confirmation': (
+        "Appointment Confirmation - {{ scan_name }}",
+        """
+Dear {{ first_name }},
+
+Your appointment has been scheduled for:
+Date: {{ date|date:'D j M Y' }}
+Time: {{ time|time:'H:i' }}
+Service: {{ scan_name }}
+
+Please arrive 15 minutes early.
+""" + _SIGNATURE,
+        "MIC Radiology: {{ scan_name }} booked for {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }}. Please arrive 15 minutes early.",
+    ),
+    'appointment_reminder': (
+        "Appointment Reminder",
+        """
+Dear {{ first_name }},
+
+This is a reminder about your upcoming appointment:
+Date: {{ date|date:'D j M Y' }}
+Time: {{ time|time:'H:i' }}
+Service: {{ scan_name }}
+
+Please call +1-234-567 to reschedule if needed.
+""" + _SIGNATURE,
+        "MIC Radiology reminder: {{ scan_name }} on {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }}. Call +1-234-567 to reschedule.",
+    ),
+    'appointment_cancelled': (
+        "Appointment Cancelled - {{ scan_name }}",
+        """
+Dear {{ first_name }},
+
+Your appointment scheduled for {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }} has been cancelled.
+Cancelled by: {{ actor_name }}.
+
+If you have questions, please contact reception.
+""" + _SIGNATURE,
+        "MIC Radiology: your appointment on {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }} has been cancelled.",
+    ),
+    'appointment_cancelled_staff': ("Appointment Cancelled - {{ scan_name }}", _STAFF_CANCELLED, _STAFF_CANCELLED),
+    'appointment_cancelled_reception': ("[Reception] Appointment Cancelled - {{ scan_name }}", _STAFF_CANCELLED, _STAFF_CANCELLED),
+    'appointment_completed': (
+        "Appointment Completed - {{ scan_name }}",
+        """
+Dear {{ first_name }},
+
+Your appointment scheduled for {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }} has been marked as completed.
+Marked completed by: {{ actor_name }}.
+
+You can log in to view any reports or follow-up instructions.
+""" + _SIGNATURE,
+        "MIC Radiology: your appointment on {{ date|date:'D j M Y' }} has been completed.",
+    ),
+    'appointment_completed_staff': ("Appointment Completed - {{ scan_name }}", _STAFF_COMPLETED, _STAFF_COMPLETED),
+    'appointment_completed_reception': ("[Reception] Appointment Completed - {{ scan_name }}", _STAFF_COMPLETED, _STAFF_COMPLETED),
+    'report_ready': (
+        "Your Radiology Report is Ready",
+        """
+Dear {{ first_name }},
+
+Your radiology report for {{ scan_name }} is now ready for download.
+
+Log in to your account to view and download your report.
+""" + _SIGNATURE,
+        "MIC Radiology: your {{ scan_name }} report is ready. Log in to download it.",
+    ),
+    'payment_received': (
+        "Payment Received",
+        """
+Dear {{ first_name }},
+
+We have received your payment of {{ amount }}.
+
+Transaction ID: {{ transaction_id }}
+Status: {{ payment_status }}
+
+Your appointment is confirmed for {{ date|date:'D j M Y' }} at {{ time|time:'H:i' }}.
+""" + _SIGNATURE,
+        "MIC Radiology: payment of {{ amount }} received ({{ payment_status }}).",
+    ),
+    'digest': (
+        "{{ count }} update{{ count|pluralize }} from MIC Radiology",
+        """
+Dear {{ first_name }},
+
+Here is what happened since your last summary:
+
+{% for entry in entries %}- {{ entry.line }}
+{% endfor %}""" + _SIGNATURE,
+        "MIC Radiology: {{ count }} update{{ count|pluralize }} waiting in your inbox.",
+    ),
+}
+
+# name -> (version, compiled parts); one entry per template name
+_compiled = {}
+_lock = threading.Lock()
+
+
+def _compile(parts):
+    return tuple(engine.from_string(part) for part in parts)
+
+
+def _default_parts(name):
+    if name not in DEFAULTS:
+        raise KeyError(f"No notification template or default named '{name}'")
+    return DEFAULTS[name]
+
+
+def compiled(name):
+    """
+    Return the compiled (subject, body, sms) templates for a name.
+
+    One small query reads the active row's id and updated_at; the text is
+    only fetched and parsed again when that version changes, so an edit in
+    the admin is picked up by running workers on their next render.
+    """
+    row = NotificationTemplate.objects.filter(name=name, is_active=True).values_list('id', 'updated_at').first()
+    version = row or ('default',)
+    cached = _compiled.get(name)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    if row:
+        defaults = DEFAULTS.get(name, ('', '', ''))
+        template = NotificationTemplate.objects.get(id=row[0])
+        parts = (
+            template.email_subject_template or defaults[0],
+            template.email_body_template or defaults[1],
+            template.sms_template or defaults[2],
+        )
+    else:
+        parts = _default_parts(name)
+
+    templates = _compile(parts)
+    with _lock:
+        _compiled[name] = (version, templates)
+    return templates
+
+
+def _render(templates, context):
+    context = Context(context, autoescape=False)
+    return Rendered(*(template.render(context) for template in templates))
+
+
+class Renderer:
+    """
+    Renders many messages, resolving each template name once.
+
+    Use one Renderer per job so a batch of thousands costs one lookup per
+    template name rather than one per message.
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def _get(self, name):
+        if name not in self._templates:
+            self._templates[name] = compiled(name)
+        return self._templates[name]
+
+    def render(self, name, context):
+        return _render(self._get(name), context)
+
+    def render_many(self, name, contexts):
+        templates = self._get(name)
+        return [_render(templates, context) for context in contexts]
+
+
+def render(name, context):
+    """Render one message as (subject, body, sms)"""
+    return Renderer().render(name, context)
+
+
+def render_many(name, contexts):
+    """Render a list of contexts against one template lookup"""
+    return Renderer().render_many(name, contexts)
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from apps.notifications import counters
+from apps.notifications.models import Notification
+from apps.users.models import CustomUser
+
+
+class UnreadCounterTests(TestCase):
+    """The unread count a user sees includes notifications created by other processes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = CustomUser.objects.create_user(username='patient', password='secret', role='patient')
+
+    def setUp(self):
+        cache.clear()
+
+    def notify_from(self, other_cache):
+        # Another web or worker process: same database, its own handle on the cache
+        with mock.patch.object(counters, 'cache', other_cache), self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(recipient=self.patient, notification_type='appointment_confirmation',
+                                        channel='email', subject='Confirmed', message='See you soon')
+
+    def test_process_local_cache_reads_the_database(self):
+        self.assertEqual(counters.unread_count(self.patient.id), 0)
+        self.notify_from(LocMemCache('another-process', {}))
+        self.assertEqual(counters.unread_count(self.patient.id), 1)
+
+    @mock.patch.object(counters, '_shared', return_value=True)
+    def test_shared_cache_counter_sees_other_writers(self, shared):
+        self.assertEqual(counters.unread_count(self.patient.id), 0)
+        # A new connection to the same LOCATION shares the store, as Redis clients do
+        self.notify_from(caches.create_connection('default'))
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.unread_count(self.patient.id), 1)
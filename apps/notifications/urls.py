@@ -3,6 +3,8 @@ from apps.notifications import views
 
 urlpatterns = [
     path('list/', views.notification_list, name='notification_list'),
+    path('preferences/', views.notification_preferences, name='notification_preferences'),
     path('<uuid:pk>/mark-read/', views.mark_notification_read, name='mark_notification_read'),
     path('unread-count/', views.notification_unread_count, name='notification_unread_count'),
+    path('dispatch-metrics/', views.dispatch_metrics, name='dispatch_metrics'),
 ]
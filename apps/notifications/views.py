@@ -1,42 +1,103 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from apps.notifications.models import Notification
+from django.utils import timezone
+from django.views.decorators.http import condition
+from apps.notifications.forms import NotificationPreferenceForm
+from apps.notifications.models import Notification, NotificationPreference
+from apps.notifications.counters import incr_unread, invalidate_unread, unread_count
+from apps.notifications.filters import NotificationFilter
+from apps.notifications.dispatch import dispatch_metrics as get_dispatch_metrics
 from django.http import JsonResponse
+from mic_radiology.pagination import KeysetPaginator, cursor_querystring
+
+NOTIFICATIONS_PER_PAGE = 25
 
 @login_required(login_url='login')
 def notification_list(request):
-    """List user notifications"""
-    # Mark any pending/sent notifications as delivered when the user views their notifications
-    user_notifications = request.user.notifications.all()
-    unread_qs = user_notifications.filter(status__in=['pending', 'sent'])
-    if unread_qs.exists():
-        unread_qs.update(status='delivered')
+    """List user notifications, one keyset page at a time"""
+    notification_filter = NotificationFilter(request.GET, queryset=request.user.notifications.all())
+    paginator = KeysetPaginator(notification_filter.qs, ('created_at', 'id'), per_page=NOTIFICATIONS_PER_PAGE)
+    page = paginator.page(request.GET.get('cursor'))
 
-    notifications = request.user.notifications.all().order_by('-created_at')
+    # Only what the user is looking at counts as read
+    unread_ids = [n.id for n in page.object_list if n.status in Notification.UNREAD_STATUSES]
+    if unread_ids:
+        marked = Notification.objects.filter(id__in=unread_ids, status__in=Notification.UNREAD_STATUSES).update(
+            status='delivered', delivered_at=timezone.now()
+        )
+        incr_unread(request.user.id, -marked)
+        for notification in page.object_list:
+            if notification.id in unread_ids:
+                notification.status = 'delivered'
 
     context = {
-        'notifications': notifications,
-        'unread_count': 0,
+        'notifications': page.object_list,
+        'page': page,
+        'filter': notification_filter,
+        'next_url': cursor_querystring(request.GET, page.next_cursor) if page.has_next() else None,
+        'previous_url': cursor_querystring(request.GET, page.previous_cursor) if page.has_previous() else None,
+        'unread_count': unread_count(request.user.id),
     }
     return render(request, 'notifications/notification_list.html', context)
 
 
+@login_required(login_url='login')
+def notification_preferences(request):
+    """Let staff switch their updates to a periodic digest"""
+    if request.user.is_patient():
+        messages.error(request, 'Access denied.')
+        return redirect('notification_list')
+
+    preference, _ = NotificationPreference.objects.get_or_create(user=request.user)
+    if request.method == 'POST':
+        form = NotificationPreferenceForm(request.POST, instance=preference)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Notification preferences saved.')
+            return redirect('notification_list')
+    else:
+        form = NotificationPreferenceForm(instance=preference)
+
+    return render(request, 'notifications/preferences.html', {'form': form})
+
+
 @login_required(login_url='login')
 def mark_notification_read(request, pk):
     """Mark notification as read"""
     notification = get_object_or_404(Notification, id=pk, recipient=request.user)
     
-    if notification.status in ['pending', 'sent']:
+    if notification.status in Notification.UNREAD_STATUSES:
         notification.status = 'delivered'
-        notification.save()
+        notification.delivered_at = timezone.now()
+        notification.save(update_fields=['status', 'delivered_at'])
+        invalidate_unread(request.user.id)
     
     return redirect('notification_list')
 
 
+def _unread_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    request.unread_count = unread_count(request.user.id)
+    return f"unread-{request.unread_count}"
+
+
 @login_required(login_url='login')
+@condition(etag_func=_unread_etag)
 def notification_unread_count(request):
-    """Return JSON with count of unread notifications for current user."""
-    notifications = request.user.notifications.all()
-    count = notifications.filter(status__in=['pending', 'sent']).count()
-    return JsonResponse({'unread_count': count})
+    """
+    Return JSON with count of unread notifications for current user.
+
+    The count comes from the cache; a poll sending the last ETag in
+    If-None-Match gets an empty 304 while the count is unchanged.
+    """
+    return JsonResponse({'unread_count': request.unread_count})
+
+
+@login_required(login_url='login')
+def dispatch_metrics(request):
+    """Return task dispatch counters for this worker process (staff only)."""
+    if not request.user.is_staff_user() and not request.user.is_superuser:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    return JsonResponse(get_dispatch_metrics())
@@ -56,6 +56,7 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=['appointment']),
             models.Index(fields=['status']),
+            models.Index(fields=['created_at', 'status'], name='payment_created_status_idx'),
         ]
     
     def __str__(self):
@@ -4,6 +4,8 @@ from django.contrib import messages
 from django.http import JsonResponse
 from apps.appointments.models import Appointment
 from apps.payments.models import Payment, PaymentShortfall
+from apps.notifications.dispatch import dispatch
+from apps.notifications.tasks import send_payment_confirmation
 
 @login_required(login_url='login')
 def process_payment(request, appointment_id):
@@ -41,8 +43,7 @@ def process_payment(request, appointment_id):
         payment.save()
         
         # Send confirmation notification
-        from apps.notifications.tasks import send_payment_confirmation
-        send_payment_confirmation.delay(payment.id)
+        dispatch(send_payment_confirmation, str(payment.id))
         
         messages.success(request, 'Payment completed successfully!')
         return redirect('appointment_detail', pk=appointment_id)
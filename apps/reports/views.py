@@ -6,6 +6,8 @@ from apps.appointments.models import Appointment
 from apps.reports.models import Report, ReportAccess
 from apps.reports.forms import ReportUploadForm, FeedbackForm
 from apps.analytics.models import Feedback
+from apps.notifications.dispatch import dispatch
+from apps.notifications.tasks import send_report_ready_notification
 
 @login_required(login_url='login')
 def upload_report(request, pk):
@@ -37,8 +39,7 @@ def upload_report(request, pk):
             messages.success(request, 'Report uploaded successfully!')
             
             # Send notification to patient and doctor
-            from apps.notifications.tasks import send_report_ready_notification
-            send_report_ready_notification.delay(report.id)
+            dispatch(send_report_ready_notification, str(report.id))
             
             return redirect('appointment_detail', pk=pk)
     else:
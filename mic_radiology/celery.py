@@ -2,7 +2,10 @@
 Celery configuration for MIC Radiology Management System
 """
 import os
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mic_radiology.settings')
 
@@ -10,6 +13,13 @@ app = Celery('mic_radiology')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    """Record the publish time so queue_stats can report the oldest message's age"""
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -2,6 +2,15 @@
 Custom middleware for MIC Radiology Management System
 """
 
+def allow_caching(response):
+    """
+    Exempt a response from NoCacheMiddleware, for views that set their own
+    Cache-Control (e.g. versioned chart images that never change)
+    """
+    response.allow_caching = True
+    return response
+
+
 class NoCacheMiddleware:
     """
     Middleware to prevent caching of sensitive pages and authentication-related responses
@@ -11,6 +20,8 @@ class NoCacheMiddleware:
 
     def __call__(self, request):
         response = self.get_response(request)
+        if getattr(response, 'allow_caching', False):
+            return response
         
         # Add no-cache headers to all responses to prevent authentication caching
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0, private'
@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination for large, newest-first listings
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _encode(direction, values):
+    payload = json.dumps({'d': direction, 'v': [str(value) for value in values]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return payload['d'], payload['v']
+    except (ValueError, KeyError, TypeError):
+        return None, None
+
+
+def cursor_querystring(params, cursor):
+    """Return '?...' for the current GET params with the cursor swapped in"""
+    params = params.copy()
+    params['cursor'] = cursor
+    return '?' + params.urlencode()
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset ordered descending by a unique tuple of keys.
+
+    Each page is one indexed range scan of per_page + 1 rows, so the cost
+    does not grow with the page number or the table size the way OFFSET does.
+    """
+
+    def __init__(self, queryset, keys, per_page=25):
+        self.queryset = queryset
+        self.keys = tuple(keys)
+        self.per_page = per_page
+
+    def _values(self, raw):
+        """
+        Cursor values converted to the key fields' types, or None when the
+        cursor is stale or has been tampered with
+        """
+        if not isinstance(raw, list) or len(raw) != len(self.keys):
+            return None
+        values = []
+        for key, value in zip(self.keys, raw):
+            field = self.queryset.model._meta.get_field(key)
+            try:
+                value = field.to_python(value)
+            except (ValidationError, ValueError, TypeError):
+                return None
+            if value is None:
+                return None
+            values.append(value)
+        return values
+
+    def _seek(self, values, lookup):
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[position]})
+            for previous_key, value in zip(self.keys[:position], values[:position]):
+                step &= Q(**{previous_key: value})
+            condition |= step
+        return condition
+
+    def _cursor(self, direction, obj):
+        return _encode(direction, [getattr(obj, key) for key in self.keys])
+
+    def page(self, cursor=None):
+        descending = [f'-{key}' for key in self.keys]
+        direction, values = _decode(cursor) if cursor else (None, None)
+        values = self._values(values) if direction else None
+        if values is None:
+            # A bad cursor serves the first page rather than an error
+            direction = None
+
+        if direction == 'p':
+            rows = list(self.queryset.filter(self._seek(values, 'gt')).order_by(*self.keys)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        elif direction == 'n':
+            rows = list(self.queryset.filter(self._seek(values, 'lt')).order_by(*descending)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = True
+        else:
+            rows = list(self.queryset.order_by(*descending)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = False
+
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor('n', rows[-1]) if has_next else None,
+            previous_cursor=self._cursor('p', rows[0]) if has_previous else None,
+        )
@@ -7,6 +7,8 @@ from pathlib import Path
 from typing import cast
 from decouple import config
 import dj_database_url
+from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'apps.payments',
     'apps.analytics',
     'apps.notifications',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
@@ -99,6 +102,22 @@ else:
         }
     }
 
+# Cache: Redis when CACHE_URL is set (needed for counters shared between web and worker processes)
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -154,17 +173,181 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default='True', cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
+RECEPTION_EMAIL = config('RECEPTION_EMAIL', default='reception@example.com')
+
+# Notification outbox (drained by the drain_outbox task or management command)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default='100', cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default='8', cast=int)
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default='300', cast=int)
+
 # Twilio SMS Configuration
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
 
+# SMS delivery (apps.notifications.sms). Backends: twilio, console, filebased, locmem, disabled.
+# Defaults to Twilio when it is configured, the console in DEBUG, and otherwise
+# to dropping messages (logging only a count) rather than printing patient data
+if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER:
+    _DEFAULT_SMS_BACKEND = 'apps.notifications.sms.backends.twilio.SmsBackend'
+elif DEBUG:
+    _DEFAULT_SMS_BACKEND = 'apps.notifications.sms.backends.console.SmsBackend'
+else:
+    _DEFAULT_SMS_BACKEND = 'apps.notifications.sms.backends.disabled.SmsBackend'
+SMS_BACKEND = config('SMS_BACKEND', default=_DEFAULT_SMS_BACKEND)
+SMS_FILE_PATH = config('SMS_FILE_PATH', default=str(BASE_DIR / 'sms-messages'))
+SMS_RATE_PER_SECOND = config('SMS_RATE_PER_SECOND', default='10', cast=float)
+SMS_BURST = config('SMS_BURST', default='20', cast=int)
+SMS_BATCH_SIZE = config('SMS_BATCH_SIZE', default='100', cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Task routing: patient-facing messages never wait behind bulk jobs.
+# 'transactional' and 'bulk' are consumed by separate workers (see Procfile),
+# so each class gets its own concurrency. Priorities order work within a
+# queue (Redis: 0 is served first).
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('transactional', routing_key='transactional'),
+    Queue('bulk', routing_key='bulk'),
+    Queue('default', routing_key='default'),
+)
+CELERY_TASK_ROUTES = {
+    'apps.notifications.tasks.send_appointment_confirmation': {'queue': 'transactional', 'priority': 0},
+    'apps.notifications.tasks.send_appointment_cancelled': {'queue': 'transactional', 'priority': 0},
+    'apps.notifications.tasks.send_appointment_completed': {'queue': 'transactional', 'priority': 3},
+    'apps.notifications.tasks.send_payment_confirmation': {'queue': 'transactional', 'priority': 0},
+    'apps.notifications.tasks.send_report_ready_notification': {'queue': 'transactional', 'priority': 3},
+    'apps.notifications.tasks.drain_outbox': {'queue': 'transactional', 'priority': 0},
+    'apps.notifications.tasks.sweep_outbox': {'queue': 'transactional', 'priority': 6},
+    'apps.notifications.tasks.send_bulk_status_notifications': {'queue': 'transactional', 'priority': 6},
+    'apps.notifications.tasks.send_appointment_reminder': {'queue': 'bulk', 'priority': 3},
+    'apps.notifications.tasks.flush_digests': {'queue': 'bulk', 'priority': 3},
+    'apps.notifications.tasks.retry_notifications': {'queue': 'bulk', 'priority': 6},
+    'apps.notifications.tasks.purge_notifications': {'queue': 'bulk', 'priority': 9},
+    'apps.appointments.tasks.*': {'queue': 'bulk', 'priority': 6},
+    'apps.analytics.tasks.refresh_rollup': {'queue': 'bulk', 'priority': 6},
+    'apps.analytics.tasks.*': {'queue': 'bulk', 'priority': 9},
+    'apps.jobs.tasks.*': {'queue': 'bulk', 'priority': 9},
+}
+# Periodic jobs, published by a single `celery beat` (see Procfile). Each task
+# takes a database lease (apps.jobs), so a duplicate beat or a redelivered
+# message cannot run the same job twice; every run is logged as a JobRun.
+CELERY_BEAT_SCHEDULE = {
+    'send-appointment-reminders': {
+        'task': 'apps.appointments.tasks.send_appointment_reminders',
+        'schedule': crontab(hour=9, minute=0),  # 9 AM daily
+    },
+    'check-missed-appointments': {
+        'task': 'apps.appointments.tasks.check_missed_appointments',
+        'schedule': crontab(hour=18, minute=0),  # 6 PM daily
+    },
+    'sweep-notification-outbox': {
+        'task': 'apps.notifications.tasks.sweep_outbox',
+        'schedule': crontab(),  # Every minute, catches messages whose nudge was lost
+    },
+    'retry-notifications': {
+        'task': 'apps.notifications.tasks.retry_notifications',
+        'schedule': crontab(),  # Every minute; only rows due on the retry index are read
+    },
+    'flush-notification-digests': {
+        'task': 'apps.notifications.tasks.flush_digests',
+        'schedule': crontab(minute='*/5'),  # Each user's window is checked every 5 minutes
+    },
+    'purge-notifications': {
+        'task': 'apps.notifications.tasks.purge_notifications',
+        'schedule': crontab(hour=3, minute=30),  # 3:30 AM daily, off-peak
+    },
+    'reconcile-analytics-rollups': {
+        'task': 'apps.analytics.tasks.reconcile_rollups',
+        'schedule': crontab(hour=2, minute=30),  # Nightly, repairs edits that bypassed the save hooks
+    },
+    'sweep-analytics-exports': {
+        'task': 'apps.analytics.tasks.sweep_exports',
+        'schedule': crontab(minute='*/5'),
+    },
+    'prune-job-runs': {
+        'task': 'apps.jobs.tasks.prune_job_runs',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
+JOB_RUN_RETENTION_DAYS = config('JOB_RUN_RETENTION_DAYS', default='30', cast=int)
+# Days (back from today) the nightly job rebuilds in the analytics rollups
+ANALYTICS_RECONCILE_DAYS = config('ANALYTICS_RECONCILE_DAYS', default='35', cast=int)
+# Analytics result cache: entries are invalidated by a data version, the TTL only bounds memory use
+ANALYTICS_CACHE_SECONDS = config('ANALYTICS_CACHE_SECONDS', default='86400', cast=int)
+ANALYTICS_RECOMPUTE_LOCK_SECONDS = config('ANALYTICS_RECOMPUTE_LOCK_SECONDS', default='30', cast=int)
+ANALYTICS_RECOMPUTE_WAIT_SECONDS = config('ANALYTICS_RECOMPUTE_WAIT_SECONDS', default='2', cast=float)
+# Background exports (apps.analytics.exports), stored under MEDIA_ROOT/analytics_exports
+ANALYTICS_EXPORT_CHUNK_SIZE = config('ANALYTICS_EXPORT_CHUNK_SIZE', default='20000', cast=int)
+ANALYTICS_EXPORT_MAX_DAYS = config('ANALYTICS_EXPORT_MAX_DAYS', default='3660', cast=int)
+ANALYTICS_EXPORT_TIMEOUT_SECONDS = config('ANALYTICS_EXPORT_TIMEOUT_SECONDS', default='3600', cast=int)
+ANALYTICS_EXPORT_RETENTION_DAYS = config('ANALYTICS_EXPORT_RETENTION_DAYS', default='7', cast=int)
+# Server-side charts (apps.analytics.charts): drawing processes per web process, and where images are cached
+ANALYTICS_CHART_WORKERS = config('ANALYTICS_CHART_WORKERS', default='2', cast=int)
+ANALYTICS_CHART_TIMEOUT_SECONDS = config('ANALYTICS_CHART_TIMEOUT_SECONDS', default='20', cast=float)
+ANALYTICS_CHART_DIR = config('ANALYTICS_CHART_DIR', default=str(BASE_DIR / 'chart_cache'))
+# Reminder and no-show sweeps: worker tasks started per run, and how long a claimed chunk stays leased
+APPOINTMENT_SWEEP_WORKERS = config('APPOINTMENT_SWEEP_WORKERS', default='4', cast=int)
+APPOINTMENT_CLAIM_LEASE_SECONDS = config('APPOINTMENT_CLAIM_LEASE_SECONDS', default='600', cast=int)
+
+# Per-worker rate limits, to stay under provider limits during bursts
+CELERY_TASK_ANNOTATIONS = {
+    'apps.notifications.tasks.send_appointment_reminder': {'rate_limit': config('CELERY_REMINDER_RATE_LIMIT', default='20/s')},
+    'apps.notifications.tasks.send_bulk_status_notifications': {'rate_limit': config('CELERY_BULK_STATUS_RATE_LIMIT', default='30/m')},
+}
+# Take one message at a time so a long bulk task cannot hold queued ones hostage
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Task dispatch (apps.notifications.dispatch): fail fast when the broker is down
+DISPATCH_BROKER_TIMEOUT = config('DISPATCH_BROKER_TIMEOUT', default='2', cast=float)
+DISPATCH_BREAKER_THRESHOLD = config('DISPATCH_BREAKER_THRESHOLD', default='3', cast=int)
+DISPATCH_BREAKER_COOLDOWN_SECONDS = config('DISPATCH_BREAKER_COOLDOWN_SECONDS', default='30', cast=int)
+DISPATCH_FALLBACK_WORKERS = config('DISPATCH_FALLBACK_WORKERS', default='2', cast=int)
+DISPATCH_FALLBACK_QUEUE_SIZE = config('DISPATCH_FALLBACK_QUEUE_SIZE', default='100', cast=int)
+CELERY_BROKER_CONNECTION_TIMEOUT = DISPATCH_BROKER_TIMEOUT
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.5,
+    'socket_connect_timeout': DISPATCH_BROKER_TIMEOUT,
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
+    'retry_policy': {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5},
+    'socket_connect_timeout': DISPATCH_BROKER_TIMEOUT,
+}
+
+# Notifications
+UNREAD_COUNT_CACHE_SECONDS = config('UNREAD_COUNT_CACHE_SECONDS', default='300', cast=int)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default='6', cast=int)
+# How long a finished notification task id is remembered, so a redelivered message is skipped
+NOTIFICATION_TASK_DEDUP_SECONDS = config('NOTIFICATION_TASK_DEDUP_SECONDS', default='86400', cast=int)
+NOTIFICATION_RETRY_BATCH_SIZE = config('NOTIFICATION_RETRY_BATCH_SIZE', default='200', cast=int)
+# Rows still pending this long after creation are picked up by the retry sweep
+NOTIFICATION_PENDING_GRACE_SECONDS = config('NOTIFICATION_PENDING_GRACE_SECONDS', default='300', cast=int)
+
+# Notification retention: days kept per notification_type, 'default' for the rest
+NOTIFICATION_RETENTION_DAYS = {
+    'default': config('NOTIFICATION_RETENTION_DAYS', default='365', cast=int),
+    'appointment_reminder': config('NOTIFICATION_REMINDER_RETENTION_DAYS', default='90', cast=int),
+}
+NOTIFICATION_PURGE_BATCH_SIZE = config('NOTIFICATION_PURGE_BATCH_SIZE', default='1000', cast=int)
+NOTIFICATION_PURGE_PAUSE_SECONDS = config('NOTIFICATION_PURGE_PAUSE_SECONDS', default='0.5', cast=float)
+NOTIFICATION_PURGE_ARCHIVE = config('NOTIFICATION_PURGE_ARCHIVE', default='False', cast=bool)
+
+# Appointment scheduling
+CLINIC_OPENING_TIME = config('CLINIC_OPENING_TIME', default='08:00')
+CLINIC_CLOSING_TIME = config('CLINIC_CLOSING_TIME', default='17:00')
+APPOINTMENT_SLOT_MINUTES = config('APPOINTMENT_SLOT_MINUTES', default='15', cast=int)
+APPOINTMENT_BOOKING_WINDOW_DAYS = config('APPOINTMENT_BOOKING_WINDOW_DAYS', default='60', cast=int)
+
 # Login URL
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'